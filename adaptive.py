@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Adaptive Concurrency
+Tunes the number of conversion workers and I/O threads while a batch runs.
+
+The best worker count depends on image sizes, the encoder settings and
+whether storage or the CPU is the bottleneck, and it shifts within a batch.
+The controller samples throughput (in estimated pixels per second, so large
+and small images compare fairly), process CPU usage, resident memory and the
+time workers spend waiting on input and output. Worker count is tuned by
+hill climbing: keep stepping while throughput improves, undo a step that
+made it worse or an added worker that made no difference, and probe one
+worker up or down again from time to time. Reader and writer threads grow
+while workers wait on storage. Grow steps stay within the CPU and memory
+ceilings, and a memory overrun shrinks the pool.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Callable, List, Optional
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_CPU_CEILING = 0.9
+# Relative throughput change treated as noise
+TOLERANCE = 0.05
+# Settled intervals between probes for a better worker count
+PROBE_EVERY = 5
+# Share of worker time spent waiting on storage that calls for more I/O threads
+IO_WAIT_GROW = 0.10
+IO_WAIT_SHRINK = 0.01
+MAX_IO_THREADS = 16
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class Sample:
+    """Measurements over one controller interval."""
+
+    def __init__(self, seconds: float, images: int, cost_rate: float, cpu: float, rss: int,
+                 read_wait: float, write_wait: float):
+        self.seconds = seconds
+        self.images = images
+        self.cost_rate = cost_rate
+        self.cpu = cpu
+        self.rss = rss
+        self.read_wait = read_wait
+        self.write_wait = write_wait
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.seconds if self.seconds > 0 else 0.0
+
+class AdaptiveController:
+    """
+    Background thread adjusting a scheduler's active workers and the I/O thread pools.
+
+    Args:
+        scheduler: scheduler.WorkStealingScheduler started with max_workers threads
+        writer: Optional writer.OutputWriter whose threads may be resized
+        cpu_ceiling: Fraction of all CPUs the process may use before growth stops
+        memory_ceiling: Resident memory in bytes above which workers are removed
+        interval: Seconds between decisions
+        log: Callback receiving one line per decision
+    """
+
+    def __init__(self, scheduler, writer=None, cpu_ceiling: float = DEFAULT_CPU_CEILING,
+                 memory_ceiling: Optional[int] = None, interval: float = DEFAULT_INTERVAL,
+                 log: Optional[Callable[[str], None]] = None):
+        self.scheduler = scheduler
+        self.writer = writer
+        # Set per batch by the caller, since each batch gets its own prefetcher
+        self.prefetcher = None
+        self.cpu_ceiling = cpu_ceiling
+        self.memory_ceiling = memory_ceiling
+        self.interval = interval
+        self.log = log or (lambda message: None)
+        self.decisions: List[dict] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._images = 0
+        self._read_seconds = 0.0
+        # Last worker count change still being evaluated: +1, -1 or 0
+        self._last_step = 0
+        self._baseline: Optional[float] = None
+        self._settled = 0
+        # Probes alternate direction, starting upwards
+        self._probe_down = True
+        # Active workers integrated over time, up to the last change in their number
+        self._started: Optional[float] = None
+        self._changed_at = 0.0
+        self._worker_seconds = 0.0
+
+    def record(self, result):
+        """Count a finished core.ConversionResult."""
+        with self._lock:
+            self._images += 1
+            self._read_seconds += result.stage_times.get('read', 0.0)
+
+    def start(self):
+        self._started = self._changed_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, name='adaptive-controller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def average_workers(self) -> float:
+        """Time-weighted mean number of active workers since start(), for utilisation figures."""
+        with self._lock:
+            if self._started is None:
+                return float(self.scheduler.active)
+            now = time.perf_counter()
+            worker_seconds = self._worker_seconds + (now - self._changed_at) * self.scheduler.active
+            return worker_seconds / (now - self._started) if now > self._started else float(self.scheduler.active)
+
+    def __enter__(self) -> 'AdaptiveController':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _loop(self):
+        last_time = time.perf_counter()
+        last_cpu = time.process_time()
+        last_stats, last_cost = self.scheduler.stats, 0.0
+        last_images, last_read = 0, 0.0
+        last_blocked = self.writer.blocked_seconds if self.writer else 0.0
+        while not self._stop.wait(self.interval):
+            now, cpu = time.perf_counter(), time.process_time()
+            stats = self.scheduler.stats
+            # Each scheduler run starts fresh stats
+            cost = stats.completed_cost - (last_cost if stats is last_stats else 0.0)
+            with self._lock:
+                images, read = self._images - last_images, self._read_seconds - last_read
+                last_images, last_read = self._images, self._read_seconds
+            blocked = self.writer.blocked_seconds if self.writer else 0.0
+            seconds = now - last_time
+            worker_seconds = seconds * self.scheduler.active
+            self.step(Sample(
+                seconds, images,
+                cost_rate=cost / seconds,
+                cpu=(cpu - last_cpu) / seconds / (os.cpu_count() or 1),
+                rss=rss_bytes(),
+                read_wait=read / worker_seconds,
+                write_wait=(blocked - last_blocked) / worker_seconds,
+            ))
+            last_time, last_cpu = now, cpu
+            last_stats, last_cost = stats, stats.completed_cost
+            last_blocked = blocked
+
+    def _decide(self, action: str, reason: str, sample: Sample):
+        self.decisions.append({
+            'time': time.time(),
+            'action': action,
+            'reason': reason,
+            'workers': self.scheduler.active,
+            'images_per_second': round(sample.images_per_second, 3),
+            'cpu': round(sample.cpu, 3),
+            'rss_bytes': sample.rss,
+        })
+        self.log(f"{action}: {reason} ({sample.images_per_second:.2f} images/s, "
+                 f"CPU {sample.cpu:.0%}, RSS {sample.rss / 1e6:.0f} MB)")
+
+    def _set_workers(self, count: int, reason: str, sample: Sample):
+        before = self.scheduler.active
+        with self._lock:
+            now = time.perf_counter()
+            self._worker_seconds += (now - self._changed_at) * before
+            self._changed_at = now
+            after = self.scheduler.set_active(count)
+        if after != before:
+            self._decide(f"workers {before} -> {after}", reason, sample)
+
+    def step(self, sample: Sample):
+        """Make the decisions for one interval."""
+        self._tune_io(sample)
+
+        active = self.scheduler.active
+        if self.memory_ceiling and sample.rss > self.memory_ceiling:
+            self._baseline, self._last_step, self._settled = None, 0, 0
+            self._set_workers(active - 1, "memory above ceiling", sample)
+            return
+        if sample.images == 0:
+            # Nothing finished; large images may still be in progress
+            return
+
+        can_grow = (active < self.scheduler.workers and sample.cpu < self.cpu_ceiling and
+                    not (self.memory_ceiling and sample.rss > 0.9 * self.memory_ceiling))
+        rate = sample.cost_rate
+        if self._baseline is None:
+            self._baseline = rate
+            self._probe(active, can_grow, sample)
+            return
+
+        change = rate / self._baseline - 1 if self._baseline > 0 else 0.0
+        self._baseline = rate
+        step, self._last_step = self._last_step, 0
+        if not step:
+            self._settled += 1
+            if self._settled >= PROBE_EVERY:
+                # The best count shifts with the images in the batch; look again now and then
+                self._probe(active, can_grow, sample)
+        elif change > TOLERANCE:
+            # The last step helped: keep going the same way
+            if step < 0 or can_grow:
+                self._last_step = step
+                self._set_workers(active + step, f"throughput up {change:.0%}", sample)
+        elif change < -TOLERANCE:
+            self._set_workers(active - step, f"throughput down {-change:.0%}, undoing last step", sample)
+        elif step > 0:
+            # An extra worker that adds nothing only costs memory
+            self._set_workers(active - 1, "no gain from the extra worker", sample)
+
+    def _probe(self, active: int, can_grow: bool, sample: Sample):
+        """Try one worker more or, every other time, one fewer."""
+        self._settled = 0
+        self._probe_down = not self._probe_down
+        if self._probe_down and active > 1:
+            self._last_step = -1
+            self._set_workers(active - 1, "probing with fewer workers", sample)
+        elif can_grow:
+            self._last_step = 1
+            self._set_workers(active + 1, "probing with more workers", sample)
+
+    def _tune_io(self, sample: Sample):
+        pools = [('reader threads', self.prefetcher, sample.read_wait),
+                 ('writer threads', self.writer, sample.write_wait)]
+        for name, pool, wait in pools:
+            if pool is None:
+                continue
+            before = pool.threads
+            if wait > IO_WAIT_GROW and before < MAX_IO_THREADS:
+                pool.set_threads(before + 1)
+                self._decide(f"{name} {before} -> {before + 1}",
+                             f"workers waited {wait:.0%} of the time on storage", sample)
+            elif wait < IO_WAIT_SHRINK and before > 1 and sample.images > 0:
+                pool.set_threads(before - 1)
+                self._decide(f"{name} {before} -> {before - 1}", "storage keeps up", sample)
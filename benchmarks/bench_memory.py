@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Memory Benchmark
+Converts a rotating set of synthetic HEIC images many times and samples the
+resident set size, to check that RSS stays flat in long-running sessions.
+
+Usage:
+    python benchmarks/bench_memory.py [--iterations 200] [--workers 2]
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+import core
+
+# Mixed sizes so allocations of different shapes interleave, as in real batches
+SIZES = [(4032, 3024), (1600, 1200), (3024, 4032), (640, 480), (2048, 1536)]
+
+def rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def make_fixtures(directory: str):
+    paths = []
+    for i, (width, height) in enumerate(SIZES):
+        img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+        draw = ImageDraw.Draw(img)
+        for k in range(0, width, 97):
+            draw.line([(k, 0), (width - k, height)], fill=(k % 255, 80, 160), width=5)
+        path = os.path.join(directory, f"fixture_{i}.heic")
+        img.save(path, quality=80)
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure RSS over many conversions')
+    parser.add_argument('--iterations', type=int, default=200, help='Conversions per worker (default: 200)')
+    parser.add_argument('--workers', type=int, default=2, help='Concurrent worker threads (default: 2)')
+    parser.add_argument('--format', choices=['jpg', 'png'], default='jpg')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = make_fixtures(tmp)
+        output_dir = os.path.join(tmp, 'out')
+
+        def work(offset: int):
+            for i in range(args.iterations):
+                success, message = core.convert_file(
+                    fixtures[(i + offset) % len(fixtures)], args.format, output_dir)
+                if not success:
+                    raise RuntimeError(message)
+
+        samples = []
+        for round_number in range(10):
+            threads = [threading.Thread(target=work, args=(w,)) for w in range(args.workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            samples.append(rss_mb())
+            print(f"round {round_number + 1:2d}: RSS {samples[-1]:8.1f} MB", flush=True)
+
+    warm = samples[1]
+    print(f"\nRSS after warm-up {warm:.1f} MB, final {samples[-1]:.1f} MB, "
+          f"growth {samples[-1] - warm:+.1f} MB")
+
+if __name__ == '__main__':
+    main()
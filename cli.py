@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Local Tools: HEIC Converter - CLI Application
-A command-line interface for converting HEIC/HEIF images to JPG or PNG format.
+A command-line interface for converting HEIC/HEIF images to JPG, PNG, WebP or AVIF format.
 
 This module provides a simple command-line interface for batch conversion
 of HEIC/HEIF images while maintaining high quality.
@@ -14,61 +14,50 @@ License: MIT
 import os
 import sys
 import argparse
-from PIL import Image
-from pillow_heif import register_heif_opener
+import json
+from collections import deque
 from typing import List, Optional, Tuple
 
-# Register HEIF opener
-register_heif_opener()
+try:
+    from . import core
+    from .metrics import RunMetrics
+    from .scheduler import ScheduleStats, WorkStealingScheduler, plan_jobs
+    from . import distributed
+    from . import formats
+    from . import scan
+    from .adaptive import DEFAULT_CPU_CEILING, AdaptiveController
+    from .prefetch import DEFAULT_PREFETCH_BYTES, PREFETCH_MODES, Prefetcher
+    from .writer import DEFAULT_FSYNC_BATCH, DEFAULT_WRITER_THREADS, DURABILITY_MODES, OutputWriter
+except ImportError:
+    import core
+    from metrics import RunMetrics
+    from scheduler import ScheduleStats, WorkStealingScheduler, plan_jobs
+    import distributed
+    import formats
+    import scan
+    from adaptive import DEFAULT_CPU_CEILING, AdaptiveController
+    from prefetch import DEFAULT_PREFETCH_BYTES, PREFETCH_MODES, Prefetcher
+    from writer import DEFAULT_FSYNC_BATCH, DEFAULT_WRITER_THREADS, DURABILITY_MODES, OutputWriter
 
-def convert_file(file_path: str, output_format: str, output_dir: Optional[str] = None) -> Tuple[bool, str]:
+def convert_file(file_path: str, output_format: str, output_dir: Optional[str] = None,
+                 target_size: Optional[int] = None) -> Tuple[bool, str]:
     """
-    Convert a single HEIC file to JPG or PNG format.
+    Convert a single HEIC file to another format.
     
     Args:
         file_path: Path to the input HEIC file
-        output_format: Output format ('jpg' or 'png')
+        output_format: Output format ('jpg', 'png', 'webp' or 'avif')
         output_dir: Optional output directory. If None, uses the input file's directory
+        target_size: Optional maximum output size in bytes (lossy formats only)
     
     Returns:
         Tuple of (success: bool, message: str)
     """
-    try:
-        # Validate input file
-        if not os.path.exists(file_path):
-            return False, f"Input file does not exist: {file_path}"
-        
-        # Determine output directory
-        if output_dir is None:
-            output_dir = os.path.dirname(file_path)
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Create output path
-        output_path = os.path.join(
-            output_dir,
-            f"{os.path.splitext(os.path.basename(file_path))[0]}.{output_format.lower()}"
-        )
-        
-        # Convert image
-        with Image.open(file_path) as img:
-            # Convert to RGB mode if necessary
-            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                img = img.convert('RGB')
-            
-            # Save with appropriate quality
-            if output_format.lower() == 'jpg':
-                img.save(output_path, quality=95, optimize=True)
-            else:
-                img.save(output_path, optimize=True)
-        
-        return True, f"Successfully converted: {output_path}"
-    
-    except Exception as e:
-        return False, f"Error converting {file_path}: {str(e)}"
+    return core.convert_file(file_path, output_format, output_dir, target_size=target_size)
 
 def find_heic_files(directory: str) -> List[str]:
     """
-    Recursively find all HEIC files in a directory.
+    Recursively find all HEIC/HEIF files in a directory.
     
     Args:
         directory: Directory to search in
@@ -76,16 +65,199 @@ def find_heic_files(directory: str) -> List[str]:
     Returns:
         List of HEIC file paths
     """
+    extensions = formats.input_extensions(['heic'])
     heic_files = []
     for root, _, files in os.walk(directory):
         for file in files:
-            if file.lower().endswith('.heic'):
+            if formats.has_extension(file, extensions):
                 heic_files.append(os.path.join(root, file))
     return heic_files
 
+def collect_inputs(inputs: List[str], out=sys.stdout, output_format: Optional[str] = None) -> List[str]:
+    """
+    Expand input files and directories into the list of HEIC files to convert.
+    
+    Explicitly named files already in the output format are accepted too;
+    core.convert copies them instead of re-encoding. Directories are only
+    searched for HEIC files, so earlier outputs next to them are left alone.
+    
+    Args:
+        inputs: Input file and directory paths
+        out: Stream for warnings about skipped inputs
+        output_format: Optional output format name, e.g. 'jpg'
+    
+    Returns:
+        List of file paths
+    """
+    files_to_convert = []
+    for input_path in inputs:
+        if os.path.isfile(input_path):
+            # Explicitly named files are identified by content, whatever their extension
+            detected = formats.detect_format(input_path)
+            if detected is not None and detected.name in ('heic', output_format):
+                files_to_convert.append(input_path)
+            else:
+                print(f"Warning: Skipping non-HEIC file: {input_path}", file=out)
+        elif os.path.isdir(input_path):
+            heic_files = find_heic_files(input_path)
+            if heic_files:
+                files_to_convert.extend(heic_files)
+            else:
+                print(f"Warning: No HEIC files found in directory: {input_path}", file=out)
+        else:
+            print(f"Warning: Input path does not exist: {input_path}", file=out)
+    return files_to_convert
+
+def convert_batch(files: List[str], args, target_size: Optional[int], scheduler: WorkStealingScheduler,
+                  metrics: RunMetrics, manifest=None, on_result=None, writer: Optional[OutputWriter] = None,
+                  controller: Optional[AdaptiveController] = None):
+    """
+    Convert files on the scheduler, recording every result.
+    
+    Unless args.prefetch is 0, upcoming inputs are read ahead in the order
+    the scheduler hands them out. With a writer, outputs are written in the
+    background while later files encode, and each result is recorded once
+    its write has completed. All writes are flushed before returning.
+    
+    Args:
+        files: Files to convert
+        args: Parsed command-line arguments
+        target_size: Optional maximum output size in bytes
+        scheduler: Scheduler running the conversions
+        metrics: Run metrics to record results in
+        manifest: Optional distributed.Manifest to append results to
+        on_result: Optional callback invoked with each result
+        writer: Optional OutputWriter for the output files
+        controller: Optional AdaptiveController tuning this batch
+    """
+    def finish(result):
+        metrics.record(result)
+        if controller:
+            controller.record(result)
+        if manifest:
+            manifest.record(result)
+        if args.report == 'text':
+            print(f"{'✅' if result.success else '❌'} {result.message}")
+        if on_result:
+            on_result(result)
+    
+    jobs = plan_jobs(files)
+    prefetcher = None
+    if args.prefetch > 0:
+        prefetcher = Prefetcher([job.path for job in jobs], args.prefetch, args.prefetch_bytes,
+                                mode=args.prefetch_mode)
+    if controller:
+        controller.prefetcher = prefetcher
+    convert = lambda path: core.convert(path, args.format, args.output, target_size,
+                                        writer=writer, prefetcher=prefetcher)
+    pending = deque()
+    try:
+        for _, result in scheduler.run(jobs, convert):
+            if result.pending is not None:
+                pending.append(result.pending)
+            else:
+                finish(result)
+            while pending and pending[0].done():
+                finish(pending.popleft().result())
+    finally:
+        if controller:
+            controller.prefetcher = None
+        if prefetcher is not None:
+            prefetcher.close()
+    if writer is not None:
+        writer.flush()
+    for future in pending:
+        finish(future.result())
+
+def make_writer(args) -> Optional[OutputWriter]:
+    """Create the output writer requested on the command line, or None to write on the workers."""
+    if args.writer_threads == 0:
+        return None
+    return OutputWriter(args.writer_threads, args.durability, args.fsync_batch)
+
+def make_controller(args, scheduler: WorkStealingScheduler, writer: Optional[OutputWriter],
+                    out) -> Optional[AdaptiveController]:
+    """Start the adaptive concurrency controller if requested on the command line."""
+    if not args.adaptive:
+        return None
+    controller = AdaptiveController(scheduler, writer, args.cpu_ceiling, args.memory_ceiling,
+                                    log=lambda message: print(f"[adaptive] {message}", file=out, flush=True))
+    controller.start()
+    return controller
+
+def scan_main(argv: List[str]):
+    """Entry point of the 'scan' command: estimate a batch from HEIF headers only."""
+    parser = argparse.ArgumentParser(
+        prog=f"{os.path.basename(sys.argv[0])} scan",
+        description="Read HEIF headers without decoding pixels and estimate conversion runtime and output size",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  Estimate converting a directory to JPG on all CPUs:
+    %(prog)s /path/to/directory
+  
+  Estimate WebP output on 4 workers as JSON:
+    %(prog)s --format webp --workers 4 --report json /path/to/directory
+"""
+    )
+    
+    parser.add_argument(
+        'inputs',
+        nargs='+',
+        help='Input HEIC file(s) or directory containing HEIC files'
+    )
+    
+    parser.add_argument(
+        '--format',
+        choices=[fmt.name for fmt in formats.output_formats()],
+        default='jpg',
+        help='Output format to estimate for (default: jpg)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of conversion workers to estimate for (default: number of CPUs)'
+    )
+    
+    parser.add_argument(
+        '--report',
+        choices=['text', 'json'],
+        default='text',
+        help='Report format (default: text)'
+    )
+    
+    parser.add_argument(
+        '--calibrate',
+        action='store_true',
+        help='Measure conversion throughput again instead of using the cached figure'
+    )
+    
+    args = parser.parse_args(argv)
+    text_report = args.report == 'text'
+    out = sys.stdout if text_report else sys.stderr
+    
+    files = collect_inputs(args.inputs, out)
+    if not files:
+        print("Error: No HEIC files found to scan", file=out)
+        sys.exit(1)
+    
+    entries = scan.scan_files(files)
+    megapixels_per_second = scan.calibrate(args.format, force=args.calibrate)
+    summary = scan.summarize(entries, args.format, args.workers, megapixels_per_second)
+    
+    print(scan.format_summary(summary) if text_report else json.dumps(summary, indent=2))
+    
+    if summary['corrupt']:
+        sys.exit(1)
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'scan':
+        return scan_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
-        description="Convert HEIC/HEIF images to JPG or PNG format",
+        description="Convert HEIC/HEIF images to JPG, PNG, WebP or AVIF format",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
@@ -101,20 +273,53 @@ Examples:
   Convert to PNG format:
     %(prog)s --format png input.heic
   
+  Convert to WebP for smaller files:
+    %(prog)s --format webp /path/to/directory
+  
   Specify output directory:
     %(prog)s --output /path/to/output input.heic
+  
+  Keep every JPG under 500 KB:
+    %(prog)s --target-size 500KB /path/to/directory
+  
+  Convert with 4 parallel workers:
+    %(prog)s --workers 4 /path/to/directory
+  
+  Convert one of four shards (run 0/4 .. 3/4 on different hosts):
+    %(prog)s --shard 0/4 --manifest shard0.jsonl /shared/photos
+  
+  Plan a coordinated run, start workers on any host, then merge manifests:
+    %(prog)s --lease-dir /shared/leases /shared/photos
+    %(prog)s --lease-dir /shared/leases --output /shared/converted
+    %(prog)s --merge-manifests all.jsonl /shared/leases
+  
+  Let the worker count adapt at runtime, within 4 GB of memory:
+    %(prog)s --adaptive --memory-ceiling 4GB /path/to/directory
+  
+  Read up to 32 files (at most 1 GB) ahead from a network mount:
+    %(prog)s --prefetch 32 --prefetch-bytes 1GB /mnt/nfs/photos
+  
+  Write to a network mount, fsyncing outputs in groups of 64:
+    %(prog)s --durability batch --output /mnt/nfs/converted /path/to/directory
+  
+  Print a JSON run report and write Prometheus metrics:
+    %(prog)s --report json --metrics-file /var/lib/node_exporter/heic.prom /path/to/directory
+  
+  Estimate runtime and output size from file headers without converting:
+    %(prog)s scan /path/to/directory
 """
     )
     
     parser.add_argument(
         'inputs',
-        nargs='+',
-        help='Input HEIC file(s) or directory containing HEIC files'
+        nargs='*',
+        help='Input HEIC file(s) or directory containing HEIC files; '
+             'named files already in --format are copied without re-encoding'
     )
     
     parser.add_argument(
         '--format',
-        choices=['jpg', 'png'],
+        choices=[fmt.name for fmt in formats.output_formats()],
         default='jpg',
         help='Output format (default: jpg)'
     )
@@ -124,48 +329,316 @@ Examples:
         help='Output directory (default: same as input file)'
     )
     
+    parser.add_argument(
+        '--target-size',
+        metavar='SIZE',
+        help='Maximum size per output file, e.g. 500KB or 1.5MB (JPG, WebP and AVIF); '
+             'the highest quality that fits is used'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of files to convert in parallel (default: number of CPUs)'
+    )
+    
+    parser.add_argument(
+        '--report',
+        choices=['text', 'json'],
+        default='text',
+        help='Run report format; json prints one machine-readable report to stdout (default: text)'
+    )
+    
+    parser.add_argument(
+        '--metrics-file',
+        metavar='PATH',
+        help='Write run metrics in Prometheus text format to PATH'
+    )
+    
+    adaptive_group = parser.add_argument_group('adaptive concurrency')
+    
+    adaptive_group.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='Tune the number of workers and I/O threads while running, starting from --workers, '
+             'and log each change'
+    )
+    
+    adaptive_group.add_argument(
+        '--max-workers',
+        type=int,
+        help='Most workers the adaptive controller may use (default: twice the number of CPUs)'
+    )
+    
+    adaptive_group.add_argument(
+        '--cpu-ceiling',
+        type=float,
+        default=DEFAULT_CPU_CEILING,
+        metavar='FRACTION',
+        help=f'Do not add workers while the process uses more than this share of all CPUs '
+             f'(default: {DEFAULT_CPU_CEILING})'
+    )
+    
+    adaptive_group.add_argument(
+        '--memory-ceiling',
+        metavar='SIZE',
+        help='Remove workers while resident memory is above SIZE, e.g. 4GB'
+    )
+    
+    input_group = parser.add_argument_group('input reading')
+    
+    input_group.add_argument(
+        '--prefetch',
+        type=int,
+        metavar='N',
+        help='Read up to N upcoming input files ahead of the workers; 0 disables read-ahead '
+             '(default: twice the number of workers)'
+    )
+    
+    input_group.add_argument(
+        '--prefetch-bytes',
+        metavar='SIZE',
+        default=str(DEFAULT_PREFETCH_BYTES),
+        help='Most input bytes held in memory ahead of the workers, e.g. 512MB (default: 256MB)'
+    )
+    
+    input_group.add_argument(
+        '--prefetch-mode',
+        choices=PREFETCH_MODES,
+        default='auto',
+        help='memory reads files ahead into memory, advise asks the OS to cache them (posix_fadvise); '
+             'auto reads network file systems into memory and advises for local disks (default: auto)'
+    )
+    
+    output_group = parser.add_argument_group('output writing')
+    
+    output_group.add_argument(
+        '--writer-threads',
+        type=int,
+        default=DEFAULT_WRITER_THREADS,
+        help='Threads writing output files while the workers keep encoding; '
+             f'0 writes on the workers themselves (default: {DEFAULT_WRITER_THREADS})'
+    )
+    
+    output_group.add_argument(
+        '--durability',
+        choices=DURABILITY_MODES,
+        default='none',
+        help='When an output counts as done: none (written), file (fsynced one by one) '
+             'or batch (fsynced in groups) (default: none)'
+    )
+    
+    output_group.add_argument(
+        '--fsync-batch',
+        type=int,
+        default=DEFAULT_FSYNC_BATCH,
+        metavar='N',
+        help=f'Files per fsync group with --durability batch (default: {DEFAULT_FSYNC_BATCH})'
+    )
+    
+    distributed_group = parser.add_argument_group('distributed batches')
+    
+    distributed_group.add_argument(
+        '--shard',
+        metavar='INDEX/COUNT',
+        help='Only convert the files whose path hash falls in this shard, e.g. 0/4'
+    )
+    
+    distributed_group.add_argument(
+        '--lease-dir',
+        metavar='DIR',
+        help='Shared lease directory. With inputs, write a work plan there (coordinator); '
+             'without inputs, claim and convert ranges from it (worker)'
+    )
+    
+    distributed_group.add_argument(
+        '--range-size',
+        type=int,
+        default=distributed.DEFAULT_RANGE_SIZE,
+        help=f'Files per leased range when writing a plan (default: {distributed.DEFAULT_RANGE_SIZE})'
+    )
+    
+    distributed_group.add_argument(
+        '--lease-timeout',
+        type=float,
+        default=distributed.DEFAULT_LEASE_TIMEOUT,
+        help='Seconds without progress after which another worker may take over a range '
+             f'(default: {distributed.DEFAULT_LEASE_TIMEOUT})'
+    )
+    
+    distributed_group.add_argument(
+        '--worker-id',
+        help='Worker name used in leases and manifest file names (default: HOST-PID)'
+    )
+    
+    distributed_group.add_argument(
+        '--manifest',
+        metavar='PATH',
+        help='Append a JSON-lines record of every converted file to PATH '
+             '(workers default to manifest-WORKER.jsonl in the lease directory)'
+    )
+    
+    distributed_group.add_argument(
+        '--merge-manifests',
+        metavar='OUTPUT',
+        help='Merge the manifests or manifest directories given as inputs into OUTPUT and exit'
+    )
+    
     args = parser.parse_args()
     
-    # Process inputs
-    files_to_convert = []
-    for input_path in args.inputs:
-        if os.path.isfile(input_path):
-            if input_path.lower().endswith('.heic'):
-                files_to_convert.append(input_path)
-            else:
-                print(f"Warning: Skipping non-HEIC file: {input_path}")
-        elif os.path.isdir(input_path):
-            heic_files = find_heic_files(input_path)
-            if heic_files:
-                files_to_convert.extend(heic_files)
-            else:
-                print(f"Warning: No HEIC files found in directory: {input_path}")
-        else:
-            print(f"Warning: Input path does not exist: {input_path}")
+    if not args.inputs and not args.lease_dir:
+        parser.error("at least one input is required")
     
-    if not files_to_convert:
-        print("Error: No HEIC files found to convert")
-        sys.exit(1)
+    if args.shard:
+        try:
+            args.shard = distributed.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
     
-    # Convert files
-    success_count = 0
-    error_count = 0
+    if args.range_size < 1:
+        parser.error("--range-size must be at least 1")
     
-    print(f"\nConverting {len(files_to_convert)} files to {args.format.upper()}...")
-    for file_path in files_to_convert:
-        success, message = convert_file(file_path, args.format, args.output)
-        if success:
-            success_count += 1
-            print(f"✅ {message}")
-        else:
-            error_count += 1
-            print(f"❌ {message}")
+    if args.writer_threads < 0 or args.fsync_batch < 1:
+        parser.error("--writer-threads must not be negative and --fsync-batch must be at least 1")
+    
+    if args.prefetch is None:
+        args.prefetch = 2 * max(1, args.workers)
+    try:
+        args.prefetch_bytes = core.parse_size(args.prefetch_bytes)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.memory_ceiling is not None:
+        try:
+            args.memory_ceiling = core.parse_size(args.memory_ceiling)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.max_workers is None:
+        args.max_workers = 2 * (os.cpu_count() or 1)
+    if not 0 < args.cpu_ceiling <= 1:
+        parser.error("--cpu-ceiling must be between 0 and 1")
+    
+    if args.durability != 'none' and args.writer_threads == 0:
+        parser.error("--durability requires at least one writer thread")
+    
+    # Keep stdout clean for the JSON report
+    text_report = args.report == 'text'
+    out = sys.stdout if text_report else sys.stderr
+    
+    target_size = None
+    if args.target_size is not None:
+        if not formats.get_format(args.format).lossy:
+            parser.error(f"--target-size is not supported with --format {args.format}")
+        try:
+            target_size = core.parse_size(args.target_size)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.merge_manifests:
+        summary = distributed.merge_manifests(args.inputs, args.merge_manifests)
+        print(json.dumps(summary, indent=2) if not text_report else
+              f"Merged {summary['manifests']} manifests: {summary['files']} files, "
+              f"{summary['succeeded']} converted, {summary['failed']} failed")
+        return
+    
+    scheduler = WorkStealingScheduler(args.workers, args.max_workers if args.adaptive else None)
+    metrics = RunMetrics(scheduler.workers)
+    # Each convert_batch() call is a scheduler run of its own; the report covers all of them
+    schedule = ScheduleStats(scheduler.workers)
+    
+    if args.lease_dir and not args.inputs:
+        # Worker mode: convert ranges handed out through the lease directory
+        try:
+            worker = distributed.LeaseWorker(args.lease_dir, args.worker_id, args.lease_timeout)
+        except FileNotFoundError:
+            print(f"Error: No work plan found in {args.lease_dir}", file=out)
+            sys.exit(1)
+        manifest = distributed.Manifest(args.manifest or worker.manifest_path)
+        if text_report:
+            print(f"\nWorker {worker.worker_id} converting ranges from {args.lease_dir}...")
+        output_writer = make_writer(args)
+        controller = make_controller(args, scheduler, output_writer, out)
+        try:
+            while True:
+                claimed = worker.claim()
+                if claimed is None:
+                    break
+                index, files = claimed
+                convert_batch(files, args, target_size, scheduler, metrics, manifest,
+                              on_result=lambda _: worker.heartbeat(index), writer=output_writer,
+                              controller=controller)
+                schedule.merge(scheduler.stats)
+                manifest.flush()
+                worker.complete(index)
+        finally:
+            if controller:
+                controller.stop()
+            if output_writer:
+                output_writer.close()
+            manifest.close()
+    else:
+        files_to_convert = collect_inputs(args.inputs, out, args.format)
+        if args.shard:
+            files_to_convert = distributed.filter_shard(files_to_convert, *args.shard)
+        
+        if not files_to_convert and not args.shard:
+            print("Error: No HEIC files found to convert", file=out)
+            sys.exit(1)
+        
+        if args.lease_dir:
+            # Coordinator mode: write the plan and let workers pick it up
+            try:
+                ranges = distributed.create_plan(args.lease_dir, files_to_convert, args.range_size)
+            except FileExistsError as e:
+                print(f"Error: {e}", file=out)
+                sys.exit(1)
+            print(f"Planned {len(files_to_convert)} files in {ranges} ranges in {args.lease_dir}", file=out)
+            return
+        
+        # Convert files
+        manifest = distributed.Manifest(args.manifest) if args.manifest else None
+        if text_report:
+            print(f"\nConverting {len(files_to_convert)} files to {args.format.upper()}...")
+        output_writer = make_writer(args)
+        controller = make_controller(args, scheduler, output_writer, out)
+        try:
+            convert_batch(files_to_convert, args, target_size, scheduler, metrics, manifest,
+                          writer=output_writer, controller=controller)
+            schedule.merge(scheduler.stats)
+        finally:
+            if controller:
+                controller.stop()
+            if output_writer:
+                output_writer.close()
+            if manifest:
+                manifest.close()
+    
+    metrics.finish()
+    metrics.set_schedule(schedule)
+    if controller:
+        metrics.set_adaptive(controller.decisions, controller.average_workers())
+    
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
     
     # Print summary
-    print(f"\nConversion complete!")
-    print(f"Successfully converted: {success_count}")
-    if error_count > 0:
-        print(f"Failed to convert: {error_count}")
+    if text_report:
+        print(f"\nConversion complete!")
+        print(f"Successfully converted: {metrics.succeeded}")
+        if metrics.passthrough > 0:
+            print(f"Copied without re-encoding: {metrics.passthrough}")
+        if metrics.failed > 0:
+            print(f"Failed to convert: {metrics.failed}")
+        timing = schedule.to_dict()
+        print(f"Elapsed: {timing['makespan_seconds']:.2f}s on {round(metrics.workers, 1):g} workers "
+              f"(ideal {timing['ideal_makespan_seconds']:.2f}s, "
+              f"p95 per file {timing['job_latency_seconds']['p95']:.2f}s)")
+    else:
+        print(json.dumps(metrics.to_dict(), indent=2))
+    
+    if metrics.failed > 0:
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Conversion Core
+Shared conversion routines used by the command-line and GUI front ends.
+
+This module holds the decode/encode logic so that every entry point produces
+the same output, including size-targeted lossy encoding for consumers with a
+strict byte budget per image. Codecs come from the formats registry.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import ctypes
+import io
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+from PIL import Image
+
+try:
+    from . import formats, heif_tiles
+    from .formats import ImageFormat, UnsupportedFormatError
+except ImportError:
+    import formats
+    import heif_tiles
+    from formats import ImageFormat, UnsupportedFormatError
+
+DEFAULT_QUALITY = 95
+MIN_QUALITY = 5
+
+# Most memory Pillow may keep cached in freed image blocks for reuse
+DEFAULT_BLOCK_CACHE_LIMIT = 512 * 1024 * 1024
+# Encode buffers below this size are always kept for reuse
+MIN_BUFFER_KEEP = 4 * 1024 * 1024
+# glibc mallopt() parameter and the allocation size above which memory is mmapped
+M_MMAP_THRESHOLD = -3
+MMAP_THRESHOLD = 1024 * 1024
+
+_SIZE_UNITS = {
+    '': 1,
+    'b': 1,
+    'k': 1000,
+    'kb': 1000,
+    'kib': 1024,
+    'm': 1000 ** 2,
+    'mb': 1000 ** 2,
+    'mib': 1024 ** 2,
+    'g': 1000 ** 3,
+    'gb': 1000 ** 3,
+    'gib': 1024 ** 3,
+}
+
+def cache_dir() -> str:
+    """Per-user cache directory of the converter, under XDG_CACHE_HOME (default ~/.cache)."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'local_tools_heic_converter')
+
+def parse_size(value: str) -> int:
+    """
+    Parse a human readable byte size such as '500KB', '1.5MB' or '200000'.
+
+    Args:
+        value: Size string; decimal (KB, MB, GB) and binary (KiB, MiB, GiB) units are accepted
+
+    Returns:
+        Size in bytes
+
+    Raises:
+        ValueError: If the string cannot be parsed or is not positive
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*', str(value))
+    if not match or match.group(2).lower() not in _SIZE_UNITS:
+        raise ValueError(f"Invalid size: {value!r}")
+    size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+    if size <= 0:
+        raise ValueError(f"Size must be positive: {value!r}")
+    return size
+
+def build_output_path(file_path: str, output_format: str, output_dir: Optional[str] = None) -> str:
+    """
+    Build the output path for a converted file.
+
+    Args:
+        file_path: Path to the input file
+        output_format: Output format name, e.g. 'jpg' or 'webp'
+        output_dir: Optional output directory. If None, uses the input file's directory
+
+    Returns:
+        Path of the file to write
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(file_path)
+    return os.path.join(
+        output_dir,
+        f"{os.path.splitext(os.path.basename(file_path))[0]}.{output_format.lower()}"
+    )
+
+def prepare_image(img: Image.Image, output_format: str = 'jpg') -> Image.Image:
+    """Convert an image to a mode the output format can store, e.g. drop alpha for JPG."""
+    return formats.get_format(output_format).prepare(img)
+
+def _pin_mmap_threshold():
+    """
+    Fix glibc's mmap threshold so large temporary buffers go back to the OS.
+
+    glibc raises the threshold every time a large mmapped chunk is freed, after
+    which multi-megabyte decode and encode buffers land on the heap and
+    fragment it. An explicit MALLOC_MMAP_THRESHOLD_ setting is left alone.
+    """
+    if not sys.platform.startswith('linux') or 'MALLOC_MMAP_THRESHOLD_' in os.environ:
+        return
+    try:
+        ctypes.CDLL(None).mallopt(M_MMAP_THRESHOLD, MMAP_THRESHOLD)
+    except (OSError, AttributeError):
+        # Not glibc
+        pass
+
+class ScratchPool:
+    """
+    Scratch memory reused from file to file by concurrent workers.
+
+    Encode buffers are checked out per conversion and returned to a free
+    list, and a buffer is only dropped when it has grown far beyond any
+    recent output. Decoded pixels live in Pillow's block allocator, whose
+    free-block cache is sized to hold the largest recent image for every
+    concurrent worker, so image memory is recycled rather than handed back
+    to malloc after each file. Other large temporaries are kept off the heap
+    by pinning glibc's mmap threshold, so long sessions keep a steady RSS
+    instead of fragmenting the heap. Both settings are process-wide, so a
+    pool is only created once there is something to convert.
+
+    Args:
+        history: Number of recent files used to size buffers and the block cache
+        cache_limit: Upper bound in bytes for Pillow's free-block cache
+    """
+
+    def __init__(self, history: int = 32, cache_limit: int = DEFAULT_BLOCK_CACHE_LIMIT):
+        self.cache_limit = cache_limit
+        self._lock = threading.Lock()
+        self._free: List[io.BytesIO] = []
+        self._recent_output: deque = deque(maxlen=history)
+        self._recent_pixels: deque = deque(maxlen=history)
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._blocks_max: Optional[int] = None
+        # An explicit PILLOW_BLOCKS_MAX from the environment takes precedence
+        self._manage_blocks = 'PILLOW_BLOCKS_MAX' not in os.environ
+        _pin_mmap_threshold()
+
+    @contextmanager
+    def buffers(self, count: int = 1) -> Iterator[List[io.BytesIO]]:
+        """Check out count encode buffers, positioned at 0, for the duration of the block."""
+        with self._lock:
+            buffers = [self._free.pop() if self._free else io.BytesIO() for _ in range(count)]
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        for buffer in buffers:
+            buffer.seek(0)
+        try:
+            yield buffers
+        finally:
+            self._release(buffers)
+
+    def _release(self, buffers: List[io.BytesIO]):
+        with self._lock:
+            self._in_use -= 1
+            self._recent_output.extend(buffer.tell() for buffer in buffers)
+            largest = max(self._recent_output, default=0)
+            for buffer in buffers:
+                # Buffers are overwritten rather than truncated, so the end offset is their capacity
+                capacity = buffer.seek(0, io.SEEK_END)
+                if capacity > max(4 * largest, MIN_BUFFER_KEEP) or len(self._free) >= 2 * self._peak_in_use:
+                    continue
+                self._free.append(buffer)
+
+    def note_image(self, img: Image.Image):
+        """Record a decoded image size and grow Pillow's block cache to match."""
+        if not self._manage_blocks:
+            return
+        with self._lock:
+            self._recent_pixels.append(img.width * img.height)
+            # Pillow stores RGB and RGBA pixels in 4 bytes; the source and an RGB copy may coexist
+            image_bytes = 4 * max(self._recent_pixels)
+            block_size = Image.core.get_block_size()
+            blocks_per_image = -(-image_bytes // block_size) + 1
+            blocks = min(2 * blocks_per_image * max(1, self._peak_in_use),
+                         self.cache_limit // block_size)
+            if blocks != self._blocks_max:
+                Image.core.set_blocks_max(blocks)
+                self._blocks_max = blocks
+
+class QualitySearch:
+    """
+    Binary-search the highest lossy quality (JPG, WebP, AVIF) that fits a byte budget.
+
+    The decoded image stays in memory and is only re-encoded, into two in-memory
+    buffers per thread that are reused across files. The quality found for an
+    image is remembered per (format, megapixel, budget) bucket and used as the first
+    probe for similar images, so a typical batch needs two or three encodes
+    per file instead of a full search.
+    """
+
+    def __init__(self, min_quality: int = MIN_QUALITY, max_quality: int = DEFAULT_QUALITY):
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self._hints: Dict[Tuple[str, int, int], int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _buffers(self) -> Tuple[io.BytesIO, io.BytesIO]:
+        if not hasattr(self._local, 'buffers'):
+            self._local.buffers = [io.BytesIO(), io.BytesIO()]
+        return self._local.buffers
+
+    def _hint_key(self, img: Image.Image, target_size: int, fmt: ImageFormat) -> Tuple[str, int, int]:
+        megapixels = round(img.width * img.height / 1_000_000)
+        return fmt.name, megapixels, target_size
+
+    def encode(self, img: Image.Image, target_size: int,
+               buffers: Optional[Sequence[io.BytesIO]] = None,
+               fmt: Optional[ImageFormat] = None) -> Tuple[Optional[int], io.BytesIO]:
+        """
+        Encode an image at the highest quality not exceeding target_size.
+
+        Args:
+            img: Decoded image in a mode the format can store
+            target_size: Maximum size of the encoded file in bytes
+            buffers: Optional pair of scratch buffers, e.g. from a ScratchPool;
+                defaults to a pair kept per thread
+            fmt: Lossy output format (default: JPG)
+
+        Returns:
+            Tuple of (quality, buffer). quality is None if even the minimum quality
+            is too large; the buffer then holds the minimum-quality encoding.
+            The encoded bytes are buffer.getbuffer()[:buffer.tell()]; the buffer
+            is one of the scratch buffers and is overwritten by their next use.
+        """
+        fmt = fmt or formats.get_format('jpg')
+        key = self._hint_key(img, target_size, fmt)
+        with self._lock:
+            hint = self._hints.get(key)
+
+        trial, best = buffers if buffers is not None else self._buffers()
+        best_quality = None
+        low, high = self.min_quality, self.max_quality
+        quality = hint if hint is not None else self.max_quality
+        first_probe = True
+
+        while low <= high:
+            # Overwrite in place rather than truncating so the buffer keeps its capacity
+            trial.seek(0)
+            fmt.save(img, trial, quality=quality)
+            fits = trial.tell() <= target_size
+            if fits:
+                best_quality = quality
+                trial, best = best, trial
+                low = quality + 1
+            else:
+                high = quality - 1
+
+            if first_probe and hint is not None:
+                # Bracket the previous answer closely before falling back to bisection
+                quality = quality + 2 if fits else quality - 2
+                quality = max(low, min(high, quality))
+            else:
+                quality = (low + high) // 2
+            first_probe = False
+
+        if best_quality is None:
+            return None, trial
+
+        with self._lock:
+            self._hints[key] = best_quality
+        return best_quality, best
+
+# Shared between calls so quality hints and scratch memory carry over from file to file
+_quality_search = QualitySearch()
+# Created by the first conversion rather than on import: it tunes process-wide allocator settings
+_scratch_pool: Optional[ScratchPool] = None
+_scratch_pool_lock = threading.Lock()
+
+def _get_scratch_pool() -> ScratchPool:
+    global _scratch_pool
+    with _scratch_pool_lock:
+        if _scratch_pool is None:
+            _scratch_pool = ScratchPool()
+        return _scratch_pool
+
+class ConversionCancelled(Exception):
+    """Raised inside convert() when its cancel event is set between stages."""
+
+def _check_cancel(cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        raise ConversionCancelled()
+
+class ConversionResult:
+    """Outcome of converting one file, with the sizes and per-stage timings used for reporting."""
+
+    def __init__(self, source: str, output_path: Optional[str] = None):
+        self.source = source
+        self.output_path = output_path
+        self.success = False
+        self.message = ''
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.quality: Optional[int] = None
+        self.error_class: Optional[str] = None
+        # 'same-file', 'reflink' or 'copy' when the file took the no re-encode fast path
+        self.passthrough: Optional[str] = None
+        self.stage_times: Dict[str, float] = {}
+        # Set when the output was handed to a writer.OutputWriter; resolves to this result once written
+        self.pending: Optional[Future] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block of work and add it to stage_times under name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_times[name] = self.stage_times.get(name, 0.0) + time.perf_counter() - start
+
+    def fail(self, message: str, error_class: str) -> 'ConversionResult':
+        self.success = False
+        self.message = message
+        self.error_class = error_class
+        return self
+
+# Linux ioctl that clones a file's extents (btrfs, XFS, ...) instead of copying data
+FICLONE = 0x40049409
+
+def copy_file(source: str, destination: str) -> str:
+    """
+    Copy a file as cheaply as the filesystem allows.
+
+    Tries a reflink clone first, then falls back to shutil.copyfile, which
+    uses in-kernel copies (sendfile/copy_file_range, fcopyfile) where available.
+
+    Returns:
+        'reflink' or 'copy', depending on how the file was copied
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            import fcntl
+            with open(source, 'rb') as src, open(destination, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return 'reflink'
+        except OSError:
+            pass
+    shutil.copyfile(source, destination)
+    return 'copy'
+
+def _is_passthrough(source_format: ImageFormat, output: ImageFormat, bytes_in: int,
+                    target_size: Optional[int]) -> bool:
+    """
+    Whether the source file can be used as the output without re-encoding.
+
+    That is the case when it is already in the output format and within any
+    size budget. Re-encoding would only cost CPU and, for lossy formats,
+    quality. Copying also keeps metadata such as EXIF orientation intact.
+    """
+    return source_format is output and (target_size is None or bytes_in <= target_size)
+
+@contextmanager
+def _open_source(file_path: str, data: Optional[bytes]) -> Iterator[BinaryIO]:
+    """Open the input as a seekable file, from prefetched bytes when there are any."""
+    if data is not None:
+        yield io.BytesIO(data)
+    else:
+        with open(file_path, 'rb') as f:
+            yield f
+
+def _decode(source_fp: BinaryIO, source_format: ImageFormat,
+            grid: Optional[heif_tiles.GridImage]) -> Image.Image:
+    """Decode the whole input image, assembling a HEIF grid from its tiles when there is one."""
+    if grid is not None:
+        return grid.assemble()
+    source_fp.seek(0)
+    source = Image.open(source_fp, formats=[source_format.pil_format])
+    source.load()
+    return source
+
+def convert(file_path: str, output_format: str, output_dir: Optional[str] = None,
+            target_size: Optional[int] = None,
+            quality_search: Optional[QualitySearch] = None,
+            writer=None, prefetcher=None,
+            cancel: Optional[threading.Event] = None) -> ConversionResult:
+    """
+    Convert a single image file to another format and describe the outcome.
+
+    The input format is detected from the file's magic bytes. The image is
+    decoded, encoded into memory and then written, with each of the 'decode',
+    'encode' and 'write' stages timed separately. HEIF grid images (the
+    tiled layout phones use) are decoded a tile at a time, and PNG output
+    from them is compressed strip by strip as the tiles are decoded, which
+    is timed as 'encode'; see heif_tiles.
+
+    With a writer, the output is handed to it instead of being written by
+    the calling thread, and the returned result has success still unset and
+    its pending future set; the future resolves to the completed result.
+    With a prefetcher, the source bytes are taken from it when it has read
+    them ahead, and the time spent waiting for them is the 'read' stage.
+    A set cancel event abandons the file before its next stage, without
+    writing any output; the result then has error_class 'Cancelled'.
+
+    Args:
+        file_path: Path to the input file
+        output_format: Output format name from the formats registry, e.g. 'jpg'
+        output_dir: Optional output directory. If None, uses the input file's directory
+        target_size: Optional maximum output size in bytes (lossy formats only)
+        quality_search: Optional QualitySearch to use instead of the shared one
+        writer: Optional writer.OutputWriter that writes the output asynchronously
+        prefetcher: Optional prefetch.Prefetcher reading inputs ahead
+        cancel: Optional event checked between stages
+
+    Returns:
+        ConversionResult for the file; exceptions are captured in the result
+    """
+    result = ConversionResult(file_path)
+    try:
+        _check_cancel(cancel)
+        data = None
+        if prefetcher is not None:
+            with result.stage('read'):
+                data = prefetcher.take(file_path)
+
+        # Validate input file
+        if data is None and not os.path.exists(file_path):
+            return result.fail(f"Input file does not exist: {file_path}", 'FileNotFoundError')
+
+        output = formats.get_format(output_format)
+        if not output.can_encode:
+            raise UnsupportedFormatError(f"Cannot encode {output.label} with the installed codecs")
+        if target_size is not None and not output.lossy:
+            return result.fail(f"Target size is only supported for lossy output formats: {file_path}",
+                               'ValueError')
+
+        if data is not None:
+            source_format = formats.detect_header(data[:formats.HEADER_SIZE])
+        else:
+            source_format = formats.detect_format(file_path)
+        if source_format is None or not source_format.can_decode:
+            raise UnsupportedFormatError("Unsupported input format")
+
+        result.bytes_in = len(data) if data is not None else os.path.getsize(file_path)
+        result.output_path = output_path = build_output_path(file_path, output.name, output_dir)
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+        if _is_passthrough(source_format, output, result.bytes_in, target_size):
+            if writer is not None and not os.path.exists(output_path):
+                result.bytes_out = result.bytes_in
+                result.message = f"Copied without re-encoding: {output_path}"
+                if data is not None:
+                    # Already in memory from the prefetcher: write it rather than read the source again
+                    result.passthrough = 'copy'
+                    result.pending = writer.submit(result, data)
+                else:
+                    result.pending = writer.submit_copy(result, file_path)
+                return result
+            with result.stage('write'):
+                if os.path.exists(output_path) and os.path.samefile(file_path, output_path):
+                    result.passthrough = 'same-file'
+                else:
+                    result.passthrough = copy_file(file_path, output_path)
+            result.bytes_out = result.bytes_in
+            result.success = True
+            result.message = (f"Already {output.label}: {output_path}" if result.passthrough == 'same-file'
+                              else f"Copied without re-encoding: {output_path}")
+            return result
+
+        # Convert image
+        _check_cancel(cancel)
+        scratch_pool = _get_scratch_pool()
+        with scratch_pool.buffers(2) as buffers, _open_source(file_path, data) as source_fp:
+            with result.stage('decode'):
+                grid = heif_tiles.open_grid(source_fp) if source_format.name == 'heic' else None
+            if grid is not None and output.name == 'png':
+                # The whole image never exists at once: tiles are decoded and compressed a strip at a time
+                with result.stage('encode'):
+                    buffer = buffers[0]
+                    grid.save_png(buffer)
+            else:
+                with result.stage('decode'):
+                    source = _decode(source_fp, source_format, grid)
+                    scratch_pool.note_image(source)
+                    img = output.prepare(source)
+                    if img is not source:
+                        # Hand the decoded pixels back to the block cache before encoding
+                        source.close()
+
+                try:
+                    _check_cancel(cancel)
+                    with result.stage('encode'):
+                        if target_size is not None:
+                            search = quality_search or _quality_search
+                            result.quality, buffer = search.encode(img, target_size, buffers, output)
+                            if result.quality is None:
+                                return result.fail(
+                                    f"Error converting {file_path}: cannot fit in {target_size} bytes "
+                                    f"(minimum quality gives {buffer.tell()} bytes)", 'TargetSizeError')
+                        else:
+                            buffer = buffers[0]
+                            output.save(img, buffer)
+                finally:
+                    img.close()
+                    source.close()
+
+            _check_cancel(cancel)
+            if writer is not None:
+                # The buffer goes back to the pool, so the writer gets its own copy
+                with buffer.getbuffer() as view:
+                    encoded = bytes(view[:buffer.tell()])
+            else:
+                with result.stage('write'):
+                    with open(output_path, 'wb') as f, buffer.getbuffer() as view:
+                        f.write(view[:buffer.tell()])
+                result.bytes_out = buffer.tell()
+
+        result.message = f"Successfully converted: {output_path}"
+        if result.quality is not None:
+            result.message += f" (quality {result.quality})"
+        if writer is not None:
+            result.pending = writer.submit(result, encoded)
+        else:
+            result.success = True
+        return result
+
+    except ConversionCancelled:
+        return result.fail(f"Cancelled: {file_path}", 'Cancelled')
+    except Exception as e:
+        return result.fail(f"Error converting {file_path}: {str(e)}", type(e).__name__)
+
+def convert_file(file_path: str, output_format: str, output_dir: Optional[str] = None,
+                 target_size: Optional[int] = None,
+                 quality_search: Optional[QualitySearch] = None) -> Tuple[bool, str]:
+    """
+    Convert a single image file to another format.
+
+    Args:
+        file_path: Path to the input file
+        output_format: Output format name from the formats registry, e.g. 'jpg'
+        output_dir: Optional output directory. If None, uses the input file's directory
+        target_size: Optional maximum output size in bytes (lossy formats only)
+        quality_search: Optional QualitySearch to use instead of the shared one
+
+    Returns:
+        Tuple of (success: bool, message: str)
+    """
+    result = convert(file_path, output_format, output_dir, target_size, quality_search)
+    return result.success, result.message
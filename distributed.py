@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Distributed Batches
+Splits very large batches across processes on one or more hosts.
+
+Two modes are supported. Static sharding assigns each file to one of N
+shards by a hash of its path, so N independent runs cover a batch without
+talking to each other. Coordinated mode writes a plan of file ranges into a
+lease directory on shared storage, one small file per range so that no
+process but the coordinator ever holds the whole file list; worker
+processes claim ranges by creating lease files exclusively, refresh them
+while they work and mark them done, so a crashed worker's range is picked
+up again once its lease expires.
+
+Each run can write a JSON-lines manifest of its results, and manifests from
+all shards or workers can be merged into one.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import glob
+import hashlib
+import json
+import os
+import random
+import socket
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PLAN_FILE = 'plan.json'
+DEFAULT_RANGE_SIZE = 500
+DEFAULT_LEASE_TIMEOUT = 600
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification such as '2/8'.
+
+    Args:
+        value: 'index/count' with 0 <= index < count
+
+    Returns:
+        Tuple of (index, count)
+
+    Raises:
+        ValueError: If the specification is malformed or out of range
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}, expected INDEX/COUNT such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {value!r}, index must be in 0..{count - 1}")
+    return index, count
+
+def shard_of(path: str, count: int) -> int:
+    """
+    Return the shard a path belongs to.
+
+    The hash is taken over the normalized path as given, so every host must
+    see the shared storage under the same path for shards to line up.
+    """
+    digest = hashlib.sha1(os.path.normpath(path).encode('utf-8', 'surrogateescape')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+def filter_shard(paths: Iterable[str], index: int, count: int) -> List[str]:
+    """Keep the paths that belong to shard index of count."""
+    return [path for path in paths if shard_of(path, count) == index]
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.{default_worker_id()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _range_path(lease_dir: str, index: int, suffix: str) -> str:
+    return os.path.join(lease_dir, f"range-{index:06d}.{suffix}")
+
+def create_plan(lease_dir: str, files: List[str], range_size: int = DEFAULT_RANGE_SIZE) -> int:
+    """
+    Write a work plan splitting files into ranges for coordinated workers.
+
+    Each range's files go into a file of their own, and plan.json, written
+    last, only records how many there are.
+
+    Args:
+        lease_dir: Directory on storage shared by all workers
+        files: Files to convert
+        range_size: Number of files per leased range
+
+    Returns:
+        Number of ranges in the plan
+
+    Raises:
+        FileExistsError: If lease_dir already holds a plan
+    """
+    os.makedirs(lease_dir, exist_ok=True)
+    plan_path = os.path.join(lease_dir, PLAN_FILE)
+    if os.path.exists(plan_path):
+        raise FileExistsError(f"A plan already exists in {lease_dir}")
+    ranges = 0
+    for start in range(0, len(files), range_size):
+        # Absolute paths so workers started from any directory resolve the same files
+        _write_atomic(_range_path(lease_dir, ranges, 'files'),
+                      json.dumps([os.path.abspath(path) for path in files[start:start + range_size]]))
+        ranges += 1
+    _write_atomic(plan_path, json.dumps({'files': len(files), 'ranges': ranges, 'range_size': range_size}))
+    return ranges
+
+class LeaseWorker:
+    """
+    Claim and complete ranges of a plan created by create_plan().
+
+    Lease files are created with O_EXCL, which is atomic on local disks and
+    on NFSv3 and later, so two workers never hold the same range. Taking
+    over a stale lease creates the next generation of the lease file the
+    same way, so of several workers that saw the same stale lease only one
+    gets the range.
+
+    Each worker starts looking for work at a random range and carries on
+    from the last range it claimed, so claims cost a pass over the plan per
+    worker rather than a rescan from the first range every time.
+
+    Args:
+        lease_dir: Directory holding the plan
+        worker_id: Name recorded in leases and manifests (default: host-pid)
+        lease_timeout: Seconds without a heartbeat after which a lease is stale
+    """
+
+    def __init__(self, lease_dir: str, worker_id: Optional[str] = None,
+                 lease_timeout: float = DEFAULT_LEASE_TIMEOUT):
+        self.lease_dir = lease_dir
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_timeout = lease_timeout
+        with open(os.path.join(lease_dir, PLAN_FILE)) as f:
+            plan = json.load(f)
+        self.range_count: int = plan['ranges']
+        self._next = random.randrange(self.range_count) if self.range_count else 0
+        # Lease generation held for each claimed range
+        self._held: Dict[int, int] = {}
+
+    def _path(self, index: int, suffix: str) -> str:
+        return _range_path(self.lease_dir, index, suffix)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.lease_dir, f"manifest-{self.worker_id}.jsonl")
+
+    def _lease_path(self, index: int, generation: int) -> str:
+        return self._path(index, f"lease.{generation}")
+
+    def _try_lease(self, index: int) -> bool:
+        # The latest generation is the current lease; older ones were taken over or released
+        generation = 0
+        while os.path.exists(self._lease_path(index, generation)):
+            generation += 1
+        if generation:
+            try:
+                if time.time() - os.path.getmtime(self._lease_path(index, generation - 1)) <= self.lease_timeout:
+                    return False
+            except FileNotFoundError:
+                # Removed by complete() while we looked
+                return False
+        try:
+            # Only one worker can create a given generation, whatever lease it saw
+            fd = os.open(self._lease_path(index, generation), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(json.dumps({'worker': self.worker_id, 'claimed_at': time.time()}))
+        self._held[index] = generation
+        return True
+
+    def claim(self) -> Optional[Tuple[int, List[str]]]:
+        """
+        Claim the next unfinished, unleased range.
+
+        Returns:
+            Tuple of (range index, files) or None when no work is left to claim
+        """
+        for offset in range(self.range_count):
+            index = (self._next + offset) % self.range_count
+            if os.path.exists(self._path(index, 'done')):
+                continue
+            if self._try_lease(index):
+                # The range may have finished between the check and the lease
+                if os.path.exists(self._path(index, 'done')):
+                    self.release(index)
+                    continue
+                self._next = index + 1
+                with open(self._path(index, 'files')) as f:
+                    return index, json.load(f)
+        return None
+
+    def heartbeat(self, index: int):
+        """Refresh a held lease so other workers do not consider it stale."""
+        if index in self._held:
+            try:
+                os.utime(self._lease_path(index, self._held[index]))
+            except FileNotFoundError:
+                pass
+
+    def release(self, index: int):
+        """Give up a lease without completing the range."""
+        generation = self._held.pop(index, None)
+        if generation is not None:
+            try:
+                # Backdated rather than removed, so the next claim creates a newer generation
+                os.utime(self._lease_path(index, generation), (0, 0))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, index: int):
+        """Mark a range as done and remove its lease files."""
+        _write_atomic(self._path(index, 'done'), self.worker_id)
+        self._held.pop(index, None)
+        generation = 0
+        while True:
+            try:
+                os.remove(self._lease_path(index, generation))
+            except FileNotFoundError:
+                break
+            generation += 1
+
+    def pending(self) -> int:
+        """Number of ranges not yet marked done."""
+        return sum(1 for index in range(self.range_count)
+                   if not os.path.exists(self._path(index, 'done')))
+
+class Manifest:
+    """Append-only JSON-lines record of conversion results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a')
+
+    def record(self, result):
+        """Append a core.ConversionResult."""
+        self._file.write(json.dumps({
+            'source': result.source,
+            'output': result.output_path,
+            'success': result.success,
+            'bytes_in': result.bytes_in,
+            'bytes_out': result.bytes_out,
+            'error_class': result.error_class,
+            'message': result.message,
+        }) + '\n')
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+def find_manifests(paths: Iterable[str]) -> List[str]:
+    """Expand directories to the manifest-*.jsonl files they contain."""
+    manifests = []
+    for path in paths:
+        if os.path.isdir(path):
+            manifests.extend(sorted(glob.glob(os.path.join(path, 'manifest-*.jsonl'))))
+        else:
+            manifests.append(path)
+    return manifests
+
+def merge_manifests(paths: Iterable[str], output_path: str) -> dict:
+    """
+    Merge manifests from several shards or workers into one.
+
+    A file that appears more than once, for example because a range was
+    retried after a lease expired, keeps its successful entry if it has one,
+    otherwise its last entry.
+
+    Args:
+        paths: Manifest files or directories containing them
+        output_path: Path of the merged manifest
+
+    Returns:
+        Summary with the number of manifests, files, successes and failures
+    """
+    entries = {}
+    manifests = find_manifests(paths)
+    for manifest in manifests:
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                previous = entries.get(entry['source'])
+                if previous is None or entry['success'] or not previous['success']:
+                    entries[entry['source']] = entry
+
+    _write_atomic(output_path, ''.join(json.dumps(entries[source]) + '\n' for source in sorted(entries)))
+    succeeded = sum(1 for entry in entries.values() if entry['success'])
+    return {
+        'manifests': len(manifests),
+        'files': len(entries),
+        'succeeded': succeeded,
+        'failed': len(entries) - succeeded,
+    }
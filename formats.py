@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Format Registry
+Maps image formats to their decoders and encoders, shared by every entry point.
+
+Each format records its file extensions, how to recognise it from the first
+bytes of a file, and what the installed Pillow build can do with it. Input
+files are identified by their magic bytes rather than their extension, so
+renamed or upper-case files are handled the same way everywhere.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+from PIL import Image, features
+from pillow_heif import register_heif_opener
+
+# Register HEIF opener
+register_heif_opener()
+
+# Enough of the file to recognise every registered format
+HEADER_SIZE = 32
+
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'hevm', b'hevs', b'mif1', b'msf1'}
+AVIF_BRANDS = {b'avif', b'avis'}
+
+class UnsupportedFormatError(ValueError):
+    """Raised when a file's format is unknown or cannot be decoded or encoded."""
+
+class ImageFormat:
+    """
+    An image format and the capabilities of the installed codecs for it.
+
+    Args:
+        name: Short name used on the command line and as output extension
+        pil_format: Pillow format name used when saving
+        extensions: File extensions, lower case with leading dot; the first is canonical
+        label: Human readable name for menus and file dialogs
+        detect: Function returning True if a file header is in this format
+        save_options: Keyword arguments passed to Image.save
+        quality_option: Name of the save option controlling lossy quality, if any
+        modes: Image modes the encoder stores as they are
+        encoder_feature: Pillow feature that must be present to encode, if any
+        decoder_feature: Pillow feature that must be present to decode, if any
+        can_encode: False for formats that are only ever read
+    """
+
+    def __init__(self, name: str, pil_format: str, extensions: Sequence[str], label: str,
+                 detect: Callable[[bytes], bool], save_options: Optional[dict] = None,
+                 quality_option: Optional[str] = None, modes: Sequence[str] = ('RGB',),
+                 encoder_feature: Optional[str] = None, decoder_feature: Optional[str] = None,
+                 can_encode: bool = True):
+        self.name = name
+        self.pil_format = pil_format
+        self.extensions = tuple(extensions)
+        self.label = label
+        self.detect = detect
+        self.save_options = dict(save_options or {})
+        self.quality_option = quality_option
+        self.modes = tuple(modes)
+        self._encoder_feature = encoder_feature
+        self._decoder_feature = decoder_feature
+        self._can_encode = can_encode
+
+    @property
+    def can_decode(self) -> bool:
+        return self._decoder_feature is None or bool(features.check(self._decoder_feature))
+
+    @property
+    def can_encode(self) -> bool:
+        if not self._can_encode:
+            return False
+        return self._encoder_feature is None or bool(features.check(self._encoder_feature))
+
+    @property
+    def lossy(self) -> bool:
+        """Lossy formats have a quality setting and support size-targeted encoding."""
+        return self.quality_option is not None
+
+    @property
+    def supports_alpha(self) -> bool:
+        return 'RGBA' in self.modes
+
+    def prepare(self, img: Image.Image) -> Image.Image:
+        """
+        Convert an image to a mode this format can store.
+
+        Images already in a storable mode are returned unchanged, without a copy.
+        """
+        if img.mode in self.modes:
+            return img
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+        return img.convert('RGBA' if has_alpha and self.supports_alpha else 'RGB')
+
+    def save(self, img: Image.Image, fp, quality: Optional[int] = None):
+        """Encode img into fp, optionally overriding the lossy quality."""
+        options = dict(self.save_options)
+        if quality is not None and self.quality_option:
+            options[self.quality_option] = quality
+        img.save(fp, format=self.pil_format, **options)
+
+def _is_iso_bmff(brands: set) -> Callable[[bytes], bool]:
+    def detect(header: bytes) -> bool:
+        if header[4:8] != b'ftyp':
+            return False
+        size = int.from_bytes(header[:4], 'big')
+        # Major brand, then compatible brands after the minor version
+        listed = {header[8:12]} | {header[i:i + 4] for i in range(16, min(size, len(header)) - 3, 4)}
+        return bool(listed & brands)
+    return detect
+
+_FORMATS: Dict[str, ImageFormat] = {}
+
+def register_format(fmt: ImageFormat):
+    """Add a format to the registry, replacing any format with the same name."""
+    _FORMATS[fmt.name] = fmt
+
+def get_format(name: str) -> ImageFormat:
+    """
+    Look up a format by name or extension, e.g. 'jpg', 'JPEG' or '.heif'.
+
+    Raises:
+        UnsupportedFormatError: If no registered format matches
+    """
+    key = name.lower()
+    if key in _FORMATS:
+        return _FORMATS[key]
+    ext = key if key.startswith('.') else f".{key}"
+    for fmt in _FORMATS.values():
+        if ext in fmt.extensions or key == fmt.pil_format.lower():
+            return fmt
+    raise UnsupportedFormatError(f"Unknown image format: {name}")
+
+def formats() -> List[ImageFormat]:
+    """All registered formats in registration order."""
+    return list(_FORMATS.values())
+
+def output_formats() -> List[ImageFormat]:
+    """Formats the installed codecs can encode."""
+    return [fmt for fmt in _FORMATS.values() if fmt.can_encode]
+
+def input_extensions(names: Optional[Sequence[str]] = None) -> tuple:
+    """Extensions of the decodable formats, optionally restricted to the named ones."""
+    selected = _FORMATS.values() if names is None else [get_format(name) for name in names]
+    return tuple(ext for fmt in selected if fmt.can_decode for ext in fmt.extensions)
+
+def has_extension(path: str, extensions: Sequence[str]) -> bool:
+    """Case-insensitive extension check used for cheap directory filtering."""
+    return os.path.splitext(path)[1].lower() in extensions
+
+def detect_format(path: str) -> Optional[ImageFormat]:
+    """
+    Identify a file's format from its magic bytes.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        The matching ImageFormat, or None if the format is not recognised
+    """
+    with open(path, 'rb') as f:
+        return detect_header(f.read(HEADER_SIZE))
+
+def detect_header(header: bytes) -> Optional[ImageFormat]:
+    """Identify a format from the first HEADER_SIZE bytes of a file, or return None."""
+    # AVIF before HEIC: AVIF files usually also list the generic 'mif1' brand
+    for fmt in sorted(_FORMATS.values(), key=lambda fmt: fmt.name != 'avif'):
+        if fmt.detect(header):
+            return fmt
+    return None
+
+def dialog_filter(names: Optional[Sequence[str]] = None) -> str:
+    """Qt file dialog filter listing the decodable extensions."""
+    patterns = ' '.join(f"*{ext}" for ext in input_extensions(names))
+    return f"Image Files ({patterns});;All Files (*.*)"
+
+register_format(ImageFormat(
+    'jpg', 'JPEG', ('.jpg', '.jpeg', '.jpe'), 'JPG',
+    detect=lambda header: header[:3] == b'\xff\xd8\xff',
+    save_options={'quality': 95, 'optimize': True},
+    quality_option='quality',
+    modes=('RGB', 'L'),
+    encoder_feature='jpg', decoder_feature='jpg',
+))
+register_format(ImageFormat(
+    'png', 'PNG', ('.png',), 'PNG',
+    detect=lambda header: header[:8] == b'\x89PNG\r\n\x1a\n',
+    save_options={'optimize': True},
+    modes=('RGB', 'RGBA', 'L', 'LA'),
+    encoder_feature='zlib', decoder_feature='zlib',
+))
+register_format(ImageFormat(
+    'webp', 'WEBP', ('.webp',), 'WebP',
+    detect=lambda header: header[:4] == b'RIFF' and header[8:12] == b'WEBP',
+    save_options={'quality': 90, 'method': 4},
+    quality_option='quality',
+    modes=('RGB', 'RGBA'),
+    encoder_feature='webp', decoder_feature='webp',
+))
+register_format(ImageFormat(
+    'avif', 'AVIF', ('.avif',), 'AVIF',
+    detect=_is_iso_bmff(AVIF_BRANDS),
+    save_options={'quality': 80, 'speed': 6},
+    quality_option='quality',
+    modes=('RGB', 'RGBA'),
+    encoder_feature='avif', decoder_feature='avif',
+))
+register_format(ImageFormat(
+    'heic', 'HEIF', ('.heic', '.heif', '.hif'), 'HEIC',
+    detect=_is_iso_bmff(HEIF_BRANDS),
+    can_encode=False,
+))
+register_format(ImageFormat(
+    'tiff', 'TIFF', ('.tiff', '.tif'), 'TIFF',
+    detect=lambda header: header[:4] in (b'II*\x00', b'MM\x00*'),
+    can_encode=False,
+))
+register_format(ImageFormat(
+    'bmp', 'BMP', ('.bmp',), 'BMP',
+    detect=lambda header: header[:2] == b'BM',
+    can_encode=False,
+))
+register_format(ImageFormat(
+    'gif', 'GIF', ('.gif',), 'GIF',
+    detect=lambda header: header[:6] in (b'GIF87a', b'GIF89a'),
+    can_encode=False,
+))
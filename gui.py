@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Local Tools: HEIC Converter - GUI Application
-A modern, user-friendly desktop application for converting HEIC/HEIF images to JPG or PNG format.
+A modern, user-friendly desktop application for converting HEIC/HEIF images to JPG, PNG, WebP or AVIF format.
 
 This module provides a graphical user interface built with PyQt6 for easy batch conversion
 of HEIC/HEIF images while maintaining high quality and providing progress feedback.
@@ -17,15 +17,21 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                            QHBoxLayout, QLabel, QComboBox, QCheckBox, QPushButton, 
                            QProgressBar, QFileDialog, QScrollArea, QFrame,
                            QMessageBox, QSpacerItem, QSizePolicy)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QMimeData
-from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QIcon
-from PIL import Image
-from pillow_heif import register_heif_opener
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal, QMimeData
+from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QIcon, QPixmap
 import darkdetect
 from qt_material import apply_stylesheet
 
-# Register HEIF opener
-register_heif_opener()
+try:
+    from . import core
+    from . import formats
+    from .jobqueue import PRIORITY_USER, JobQueue
+    from .thumbnails import ThumbnailLoader
+except ImportError:
+    import core
+    import formats
+    from jobqueue import PRIORITY_USER, JobQueue
+    from thumbnails import ThumbnailLoader
 
 class FileConversionWorker(QThread):
     progress = pyqtSignal(str, int, str)  # file_path, progress, status
@@ -35,88 +41,95 @@ class FileConversionWorker(QThread):
 
     def __init__(self, files, output_format, create_subfolder):
         super().__init__()
-        self.files = files
+        self.files = list(files)
         self.output_format = output_format
         self.create_subfolder = create_subfolder
-        self.running = True
         self.completed = 0
-        self.total = len(files)
+        # Successful files that were copied rather than re-encoded
+        self.copied = 0
+        self.total = len(self.files)
         self.last_output_dir = None
+        # Files taken from the queue, whatever their outcome
+        self.processed = set()
+        self.queue = JobQueue()
+        for file_path in self.files:
+            self.queue.put(file_path)
+
+    def add_files(self, files, priority=PRIORITY_USER):
+        """Add files to the running conversion ahead of the initial batch; returns the files accepted."""
+        accepted = [file_path for file_path in files if self.queue.put(file_path, priority)]
+        self.files.extend(accepted)
+        self.total += len(accepted)
+        return accepted
 
     def run(self):
-        for file_path in self.files:
-            if not self.running:
+        while True:
+            file_path = self.queue.get()
+            if file_path is None:
                 break
+            self.processed.add(file_path)
 
-            try:
-                # Update progress at start
-                self.progress.emit(file_path, 0, "🔄 Starting...")
-                
-                # Check file type and compatibility
+            # Update progress at start
+            self.progress.emit(file_path, 0, "🔄 Starting...")
+            
+            # Check file type and compatibility
+            if not self._is_compatible(file_path, self.output_format):
                 input_ext = os.path.splitext(file_path)[1].lower()
-                if not self._is_compatible(input_ext, self.output_format):
-                    self.progress.emit(file_path, 100, f"⚠️ Warning: Converting from {input_ext} to {self.output_format} may result in quality loss")
-                    continue
-
-                # Create output directory
-                output_dir = os.path.dirname(file_path)
-                if self.create_subfolder:
-                    output_dir = os.path.join(output_dir, f"converted_{self.output_format.lower()}")
-                    os.makedirs(output_dir, exist_ok=True)
-                
-                self.last_output_dir = output_dir
-
-                # Convert file
-                output_path = os.path.join(
-                    output_dir,
-                    f"{os.path.splitext(os.path.basename(file_path))[0]}.{self.output_format.lower()}"
-                )
-
-                # Open and convert the image
-                with Image.open(file_path) as img:
-                    # Convert to RGB mode (removing alpha channel if present)
-                    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                        img = img.convert('RGB')
-                    
-                    # Progress update
-                    self.progress.emit(file_path, 50, "🔄 Converting...")
-                    
-                    # Save with appropriate quality
-                    if self.output_format.lower() == 'jpg':
-                        img.save(output_path, quality=95, optimize=True)
-                    else:
-                        img.save(output_path, optimize=True)
-
+                self.progress.emit(file_path, 100, f"⚠️ Warning: Converting from {input_ext} to {self.output_format} is not supported")
+                continue
+
+            # Create output directory
+            output_dir = os.path.dirname(file_path)
+            if self.create_subfolder:
+                output_dir = os.path.join(output_dir, f"converted_{self.output_format.lower()}")
+            
+            self.last_output_dir = output_dir
+
+            # Progress update
+            self.progress.emit(file_path, 50, "🔄 Converting...")
+
+            # Convert file
+            result = core.convert(file_path, self.output_format, output_dir, cancel=self.queue.cancel_event)
+            if result.error_class == 'Cancelled':
+                self.progress.emit(file_path, 0, "⏹ Cancelled")
+            elif result.success:
                 self.completed += 1
+                if result.passthrough:
+                    self.copied += 1
                 self.conversion_count.emit(self.completed, self.total)
-                self.progress.emit(file_path, 100, "✅ Converted")
-
-            except Exception as e:
-                self.progress.emit(file_path, 100, f"❌ Error: {str(e)}")
+                self.progress.emit(file_path, 100, "✅ Copied" if result.passthrough else "✅ Converted")
+            else:
+                self.progress.emit(file_path, 100, f"❌ {result.message}")
 
         if self.last_output_dir:
             self.output_folder.emit(self.last_output_dir)
         self.finished.emit()
 
-    def _is_compatible(self, input_ext, output_format):
-        # List of supported input formats
-        supported_formats = {
-            '.jpg': ['jpg', 'png'],
-            '.jpeg': ['jpg', 'png'],
-            '.png': ['jpg', 'png'],
-            '.heic': ['jpg', 'png'],
-            '.bmp': ['jpg', 'png'],
-            '.gif': ['jpg', 'png'],
-            '.tiff': ['jpg', 'png'],
-            '.webp': ['jpg', 'png']
-        }
-        
-        return input_ext.lower() in supported_formats and output_format.lower() in supported_formats.get(input_ext.lower(), [])
+    def _is_compatible(self, file_path, output_format):
+        # Identify the input by its magic bytes and check both codecs are available
+        try:
+            input_format = formats.detect_format(file_path)
+            output = formats.get_format(output_format)
+        except (OSError, formats.UnsupportedFormatError):
+            return False
+        return input_format is not None and input_format.can_decode and output.can_encode
 
     def stop(self):
-        self.running = False
+        """
+        Cancel the run without waiting for it.
+
+        Queued files are dropped at once and the file in progress is abandoned
+        at its next stage. Returns the files that never started.
+        """
+        return self.queue.cancel()
+
+# Size of the preview shown in each file row, and rows kept loaded beyond the visible ones
+THUMBNAIL_DISPLAY_SIZE = 48
+THUMBNAIL_MARGIN_ROWS = 20
 
 class FileListWidget(QScrollArea):
+    file_activated = pyqtSignal(str)  # file_path of a double-clicked row
+
     def __init__(self):
         super().__init__()
         self.setWidgetResizable(True)
@@ -131,15 +144,35 @@ class FileListWidget(QScrollArea):
         # Dictionary to store progress bars
         self.progress_bars = {}
 
+        # Thumbnails are only loaded for rows in view, once scrolling settles
+        self.rows = []
+        self.thumbnail_labels = {}
+        self.thumbnails_shown = set()
+        self.thumbnails = ThumbnailLoader(parent=self)
+        self.thumbnails.ready.connect(self.show_thumbnail)
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.setSingleShot(True)
+        self.thumbnail_timer.setInterval(50)
+        self.thumbnail_timer.timeout.connect(self.load_visible_thumbnails)
+        self.verticalScrollBar().valueChanged.connect(lambda value: self.thumbnail_timer.start())
+
     def add_file(self, file_path):
         if file_path in self.progress_bars:
             return
 
         frame = QFrame()
         frame.setFrameStyle(QFrame.Shape.StyledPanel)
+        # Double-clicking a file asks for it to be converted next
+        frame.mouseDoubleClickEvent = lambda event: self.file_activated.emit(file_path)
         layout = QHBoxLayout(frame)
         layout.setContentsMargins(5, 5, 5, 5)
 
+        # Thumbnail, filled in when the row comes into view
+        thumbnail_label = QLabel()
+        thumbnail_label.setFixedSize(THUMBNAIL_DISPLAY_SIZE, THUMBNAIL_DISPLAY_SIZE)
+        thumbnail_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(thumbnail_label)
+
         # File name label
         name_label = QLabel(os.path.basename(file_path))
         name_label.setMinimumWidth(200)
@@ -158,6 +191,9 @@ class FileListWidget(QScrollArea):
 
         self.layout.addWidget(frame)
         self.progress_bars[file_path] = (progress_bar, status_label)
+        self.rows.append((file_path, frame))
+        self.thumbnail_labels[file_path] = thumbnail_label
+        self.thumbnail_timer.start()
 
     def update_progress(self, file_path, progress, status):
         if file_path in self.progress_bars:
@@ -171,6 +207,53 @@ class FileListWidget(QScrollArea):
             if item.widget():
                 item.widget().deleteLater()
         self.progress_bars.clear()
+        self.rows.clear()
+        self.thumbnail_labels.clear()
+        self.thumbnails_shown.clear()
+        self.thumbnails.request([])
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.thumbnail_timer.start()
+
+    def visible_rows(self):
+        """Index range of the rows currently in view; rows are stacked top to bottom."""
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height()
+        low, high = 0, len(self.rows)
+        while low < high:
+            middle = (low + high) // 2
+            frame = self.rows[middle][1]
+            if frame.y() + frame.height() < top:
+                low = middle + 1
+            else:
+                high = middle
+        end = low
+        while end < len(self.rows) and self.rows[end][1].y() <= bottom:
+            end += 1
+        return low, end
+
+    def load_visible_thumbnails(self):
+        if self.widget().height() < self.layout.sizeHint().height():
+            # Rows just added are not laid out yet, so their positions are meaningless
+            self.thumbnail_timer.start()
+            return
+        first, end = self.visible_rows()
+        self.thumbnails.request(path for path, _ in self.rows[first:end] if path not in self.thumbnails_shown)
+        # Release thumbnails of rows far out of view so long lists keep a small footprint
+        keep = {path for path, _ in self.rows[max(0, first - THUMBNAIL_MARGIN_ROWS):end + THUMBNAIL_MARGIN_ROWS]}
+        for path in self.thumbnails_shown - keep:
+            self.thumbnail_labels[path].clear()
+        self.thumbnails_shown &= keep
+
+    def show_thumbnail(self, file_path, image):
+        label = self.thumbnail_labels.get(file_path)
+        if label is None:
+            return
+        label.setPixmap(QPixmap.fromImage(image).scaled(
+            THUMBNAIL_DISPLAY_SIZE, THUMBNAIL_DISPLAY_SIZE,
+            Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
+        self.thumbnails_shown.add(file_path)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -212,7 +295,7 @@ class MainWindow(QMainWindow):
         format_layout = QHBoxLayout()
         format_label = QLabel("Output Format:")
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["JPG", "PNG"])
+        self.format_combo.addItems([fmt.label for fmt in formats.output_formats()])
         format_layout.addWidget(format_label)
         format_layout.addWidget(self.format_combo)
         options_layout.addLayout(format_layout)
@@ -245,6 +328,8 @@ class MainWindow(QMainWindow):
         # Initialize variables
         self.files_to_convert = []
         self.worker = None
+        self.finished_workers = []
+        self.file_list.file_activated.connect(self.prioritize_file)
 
         # Set up drag and drop
         self.setAcceptDrops(True)
@@ -261,16 +346,17 @@ class MainWindow(QMainWindow):
             event.acceptProposedAction()
 
     def dropEvent(self, event: QDropEvent):
+        extensions = formats.input_extensions()
         files = []
         for url in event.mimeData().urls():
             path = url.toLocalFile()
             if os.path.isfile(path):
-                if path.lower().endswith('.heic'):
+                if formats.has_extension(path, extensions):
                     files.append(path)
             elif os.path.isdir(path):
                 for root, _, filenames in os.walk(path):
                     for filename in filenames:
-                        if filename.lower().endswith('.heic'):
+                        if formats.has_extension(filename, extensions):
                             files.append(os.path.join(root, filename))
         
         if files:
@@ -279,21 +365,33 @@ class MainWindow(QMainWindow):
     def browse_files(self, event=None):
         files, _ = QFileDialog.getOpenFileNames(
             self,
-            "Select HEIC Files",
+            "Select Images",
             "",
-            "HEIC Files (*.heic);;All Files (*.*)"
+            formats.dialog_filter()
         )
         if files:
             self.add_files(files)
 
     def add_files(self, files):
+        new_files = []
         for file in files:
             if file not in self.files_to_convert:
                 self.files_to_convert.append(file)
                 self.file_list.add_file(file)
+                new_files.append(file)
         
-        self.convert_button.setEnabled(bool(self.files_to_convert))
-        self.update_status_label()
+        if self.worker:
+            # Files added during a run are converted next; if the run is already
+            # winding down they stay in the list for the next one
+            for file in self.worker.add_files(new_files):
+                self.file_list.update_progress(file, 0, "⏫ Up next")
+        else:
+            self.convert_button.setEnabled(bool(self.files_to_convert))
+            self.update_status_label()
+
+    def prioritize_file(self, file_path):
+        if self.worker and self.worker.queue.prioritize(file_path):
+            self.file_list.update_progress(file_path, 0, "⏫ Up next")
 
     def update_status_label(self):
         count = len(self.files_to_convert)
@@ -319,9 +417,16 @@ class MainWindow(QMainWindow):
         self.status_label.setText(f"Converting: {completed}/{total} files completed")
 
     def conversion_finished(self):
-        self.files_to_convert.clear()
-        self.convert_button.setEnabled(False)
-        self.status_label.setText("Conversion completed!")
+        # Keep files that arrived too late for this run
+        self.files_to_convert = [file for file in self.files_to_convert if file not in self.worker.processed]
+        self.convert_button.setEnabled(bool(self.files_to_convert))
+        status = "Conversion completed!"
+        if self.worker.copied:
+            status += f" {self.worker.copied} copied without re-encoding"
+        self.status_label.setText(status)
+        # The finished signal comes from inside run(), so the thread may not have exited yet
+        self.finished_workers = [worker for worker in self.finished_workers if not worker.isFinished()]
+        self.finished_workers.append(self.worker)
         self.worker = None
 
     def open_output_folder(self, folder_path):
@@ -330,8 +435,12 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         if self.worker and self.worker.isRunning():
+            # Cancelled runs stop at their next stage, so waiting here is brief
             self.worker.stop()
             self.worker.wait()
+        for worker in self.finished_workers:
+            worker.wait()
+        self.file_list.thumbnails.shutdown()
         event.accept()
 
 def main():
@@ -2,162 +2,19 @@ import sys
 import os
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QLabel, QComboBox, QCheckBox, QPushButton, 
-                           QProgressBar, QFileDialog, QScrollArea, QFrame,
-                           QMessageBox, QSpacerItem, QSizePolicy)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QMimeData
+                           QFileDialog, QMessageBox, QSpacerItem, QSizePolicy)
+from PyQt6.QtCore import Qt, pyqtSignal, QMimeData
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QIcon
-from PIL import Image
-from pillow_heif import register_heif_opener
 import darkdetect
 from qt_material import apply_stylesheet
 
-# Register HEIF opener
-register_heif_opener()
-
-class FileConversionWorker(QThread):
-    progress = pyqtSignal(str, int, str)  # file_path, progress, status
-    finished = pyqtSignal()
-    conversion_count = pyqtSignal(int, int)  # completed, total
-    output_folder = pyqtSignal(str)  # Signal to emit the output folder path
-
-    def __init__(self, files, output_format, create_subfolder):
-        super().__init__()
-        self.files = files
-        self.output_format = output_format
-        self.create_subfolder = create_subfolder
-        self.running = True
-        self.completed = 0
-        self.total = len(files)
-        self.last_output_dir = None
-
-    def run(self):
-        for file_path in self.files:
-            if not self.running:
-                break
-
-            try:
-                # Update progress at start
-                self.progress.emit(file_path, 0, "🔄 Starting...")
-                
-                # Check file type and compatibility
-                input_ext = os.path.splitext(file_path)[1].lower()
-                if not self._is_compatible(input_ext, self.output_format):
-                    self.progress.emit(file_path, 100, f"⚠️ Warning: Converting from {input_ext} to {self.output_format} may result in quality loss")
-                    continue
-
-                # Create output directory
-                output_dir = os.path.dirname(file_path)
-                if self.create_subfolder:
-                    output_dir = os.path.join(output_dir, f"converted_{self.output_format.lower()}")
-                    os.makedirs(output_dir, exist_ok=True)
-                
-                self.last_output_dir = output_dir
-
-                # Convert file
-                output_path = os.path.join(
-                    output_dir,
-                    f"{os.path.splitext(os.path.basename(file_path))[0]}.{self.output_format.lower()}"
-                )
-
-                # Open and convert the image
-                with Image.open(file_path) as img:
-                    # Convert to RGB mode (removing alpha channel if present)
-                    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                        img = img.convert('RGB')
-                    
-                    # Progress update
-                    self.progress.emit(file_path, 50, "🔄 Converting...")
-                    
-                    # Save with appropriate quality
-                    if self.output_format.lower() == 'jpg':
-                        img.save(output_path, quality=95, optimize=True)
-                    else:
-                        img.save(output_path, optimize=True)
-
-                self.completed += 1
-                self.conversion_count.emit(self.completed, self.total)
-                self.progress.emit(file_path, 100, "✅ Converted")
-
-            except Exception as e:
-                self.progress.emit(file_path, 100, f"❌ Error: {str(e)}")
-
-        if self.last_output_dir:
-            self.output_folder.emit(self.last_output_dir)
-        self.finished.emit()
-
-    def _is_compatible(self, input_ext, output_format):
-        # List of supported input formats
-        supported_formats = {
-            '.jpg': ['jpg', 'png'],
-            '.jpeg': ['jpg', 'png'],
-            '.png': ['jpg', 'png'],
-            '.heic': ['jpg', 'png'],
-            '.bmp': ['jpg', 'png'],
-            '.gif': ['jpg', 'png'],
-            '.tiff': ['jpg', 'png'],
-            '.webp': ['jpg', 'png']
-        }
-        
-        return input_ext.lower() in supported_formats and output_format.lower() in supported_formats.get(input_ext.lower(), [])
-
-    def stop(self):
-        self.running = False
-
-class FileListWidget(QScrollArea):
-    def __init__(self):
-        super().__init__()
-        self.setWidgetResizable(True)
-        self.setMinimumHeight(200)
-        
-        container = QWidget()
-        self.layout = QVBoxLayout(container)
-        self.layout.setSpacing(5)
-        self.layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.setWidget(container)
-        
-        # Dictionary to store progress bars
-        self.progress_bars = {}
-
-    def add_file(self, file_path):
-        if file_path in self.progress_bars:
-            return
-
-        frame = QFrame()
-        frame.setFrameStyle(QFrame.Shape.StyledPanel)
-        layout = QHBoxLayout(frame)
-        layout.setContentsMargins(5, 5, 5, 5)
-
-        # File name label
-        name_label = QLabel(os.path.basename(file_path))
-        name_label.setMinimumWidth(200)
-        layout.addWidget(name_label)
-
-        # Progress bar
-        progress_bar = QProgressBar()
-        progress_bar.setTextVisible(False)
-        progress_bar.setMinimumWidth(150)
-        layout.addWidget(progress_bar)
-
-        # Status label
-        status_label = QLabel("🔄 Pending")
-        status_label.setMinimumWidth(100)
-        layout.addWidget(status_label)
-
-        self.layout.addWidget(frame)
-        self.progress_bars[file_path] = (progress_bar, status_label)
-
-    def update_progress(self, file_path, progress, status):
-        if file_path in self.progress_bars:
-            progress_bar, status_label = self.progress_bars[file_path]
-            progress_bar.setValue(progress)
-            status_label.setText(status)
-
-    def clear_list(self):
-        while self.layout.count():
-            item = self.layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        self.progress_bars.clear()
+try:
+    from . import formats
+    # The conversion worker and file list are shared with gui.py, so fixes to them apply to both windows
+    from .gui import FileConversionWorker, FileListWidget
+except ImportError:
+    import formats
+    from gui import FileConversionWorker, FileListWidget
 
 class DropArea(QLabel):
     files_dropped = pyqtSignal(list)
@@ -190,7 +47,7 @@ class DropArea(QLabel):
             self,
             "Select Files",
             "",
-            "Image Files (*.heic *.jpg *.jpeg *.png *.bmp *.gif *.tiff *.webp)"
+            formats.dialog_filter()
         )
         self.files_dropped.emit(files)
 
@@ -219,7 +76,7 @@ class MainWindow(QMainWindow):
         # Output format selection
         format_label = QLabel("Output Format:")
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["JPG", "PNG"])
+        self.format_combo.addItems([fmt.label for fmt in formats.output_formats()])
         self.format_combo.setStyleSheet("""
             QComboBox {
                 color: white;
@@ -306,6 +163,9 @@ class MainWindow(QMainWindow):
         # Initialize variables
         self.files = []
         self.worker = None
+        # Finished or cancelled workers whose threads may still be running
+        self.stopping_workers = []
+        self.file_list.file_activated.connect(self.prioritize_file)
         
         # Set up drag & drop
         self.setAcceptDrops(True)
@@ -314,8 +174,9 @@ class MainWindow(QMainWindow):
         self.files.extend(files)
         for file in files:
             self.file_list.add_file(file)
+        self.queue_in_running_conversion(files)
         self.convert_button.setEnabled(len(self.files) > 0)
-        self.clear_button.setEnabled(len(self.files) > 0)
+        self.clear_button.setEnabled(len(self.files) > 0 and self.worker is None)
         self.update_status()
 
     def dragEnterEvent(self, event: QDragEnterEvent):
@@ -331,7 +192,7 @@ class MainWindow(QMainWindow):
             self,
             "Select Files",
             "",
-            "Image Files (*.heic *.jpg *.jpeg *.png *.bmp *.gif *.tiff *.webp)"
+            formats.dialog_filter()
         )
         self.add_files(files)
 
@@ -340,10 +201,22 @@ class MainWindow(QMainWindow):
             if file not in self.files:
                 self.files.append(file)
                 self.file_list.add_file(file)
+        self.queue_in_running_conversion(new_files)
         
         self.convert_button.setEnabled(bool(self.files))
         self.update_status()
 
+    def queue_in_running_conversion(self, files):
+        # Files added during a run are converted next; if the run is already
+        # winding down they stay in the list for the next one
+        if self.worker:
+            for file in self.worker.add_files(files):
+                self.file_list.update_progress(file, 0, "⏫ Up next")
+
+    def prioritize_file(self, file_path):
+        if self.worker and self.worker.queue.prioritize(file_path):
+            self.file_list.update_progress(file_path, 0, "⏫ Up next")
+
     def clear_files(self):
         self.files.clear()
         self.file_list.clear_list()
@@ -354,6 +227,7 @@ class MainWindow(QMainWindow):
     def start_conversion(self):
         if not self.files:
             return
+        self.stopping_workers = [worker for worker in self.stopping_workers if not worker.isFinished()]
 
         self.worker = FileConversionWorker(
             self.files,
@@ -374,8 +248,12 @@ class MainWindow(QMainWindow):
 
     def stop_conversion(self):
         if self.worker:
-            self.worker.stop()
-            self.worker.wait()
+            # Cancel without waiting: the file in progress winds down in the
+            # background, so keep a reference until its thread has finished
+            worker = self.worker
+            worker.finished.disconnect(self.conversion_finished)
+            for file_path in worker.stop():
+                self.file_list.update_progress(file_path, 0, "⏹ Cancelled")
             self.conversion_finished()
 
     def conversion_finished(self):
@@ -383,6 +261,11 @@ class MainWindow(QMainWindow):
         self.convert_button.clicked.disconnect()
         self.convert_button.clicked.connect(self.start_conversion)
         self.clear_button.setEnabled(True)
+        if self.worker.copied:
+            self.status_label.setText(f"{self.worker.completed}/{self.worker.total} files converted, "
+                                      f"{self.worker.copied} copied without re-encoding")
+        # The finished signal comes from inside run(), so the thread may not have exited yet
+        self.stopping_workers.append(self.worker)
         self.worker = None
 
     def update_conversion_count(self, completed, total):
@@ -402,6 +285,15 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Could not open output folder: {str(e)}")
 
+    def closeEvent(self, event):
+        # Cancelled runs stop at their next stage, so waiting here is brief
+        for worker in [self.worker] + self.stopping_workers:
+            if worker and worker.isRunning():
+                worker.stop()
+                worker.wait()
+        self.file_list.thumbnails.shutdown()
+        event.accept()
+
 def main():
     app = QApplication(sys.argv)
     
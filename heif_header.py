@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - HEIF Header Reader
+Reads image properties from the HEIF box structure without decoding pixels.
+
+Only the top-level box headers and the 'meta' box are read from disk, so the
+cost of inspecting a file is a few small reads regardless of image size.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# Upper bound for the 'meta' box we are willing to load into memory
+MAX_META_SIZE = 16 * 1024 * 1024
+
+class HeifHeaderError(ValueError):
+    """Raised when a file does not have a readable HEIF box structure."""
+
+# Item types that hold coded or derived images
+IMAGE_ITEM_TYPES = {b'hvc1', b'av01', b'jpeg', b'grid', b'iovl', b'iden', b'unci'}
+
+class HeifHeader:
+    """
+    Properties of the primary image of a HEIF file.
+
+    Attributes:
+        brand: Major brand from the 'ftyp' box, e.g. 'heic'
+        width, height: Dimensions of the primary image as displayed, after cropping and rotation
+        bit_depth: Bits per channel of the primary image (8 if not declared)
+        image_count: Number of top-level images (not counting thumbnails, tiles or auxiliary images)
+        thumbnail_count: Number of thumbnail images
+        is_grid: Whether the primary image is a grid of tiles
+        tile_count: Number of tiles in the primary grid (1 for a plain image)
+    """
+
+    def __init__(self, brand: str, width: int, height: int, bit_depth: int = 8,
+                 image_count: int = 1, thumbnail_count: int = 0, is_grid: bool = False,
+                 tile_count: int = 1):
+        self.brand = brand
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.image_count = image_count
+        self.thumbnail_count = thumbnail_count
+        self.is_grid = is_grid
+        self.tile_count = tile_count
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+def _iter_boxes(data: bytes, offset: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload_start, box_end) for each box in data[offset:end]."""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise HeifHeaderError("Truncated box header")
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise HeifHeaderError(f"Invalid size for box {box_type!r}")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+def _read_top_level(f: BinaryIO) -> Tuple[bytes, bytes]:
+    """Return the payloads of the 'ftyp' and 'meta' boxes, skipping everything else."""
+    ftyp = meta = None
+    while ftyp is None or meta is None:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            largesize = f.read(8)
+            if len(largesize) < 8:
+                raise HeifHeaderError(f"Truncated header of box {box_type!r}")
+            size = struct.unpack('>Q', largesize)[0]
+            header_size = 16
+        if 0 < size < header_size:
+            raise HeifHeaderError(f"Invalid size for box {box_type!r}")
+        payload_size = size - header_size if size else -1
+        if box_type in (b'ftyp', b'meta'):
+            if payload_size > MAX_META_SIZE:
+                raise HeifHeaderError(f"Box {box_type!r} is too large")
+            payload = f.read(payload_size)
+            if len(payload) < payload_size:
+                raise HeifHeaderError(f"Truncated box {box_type!r}")
+            if box_type == b'ftyp':
+                ftyp = payload
+            else:
+                meta = payload
+        elif payload_size < 0:
+            break
+        else:
+            f.seek(payload_size, 1)
+    if ftyp is None:
+        raise HeifHeaderError("Missing 'ftyp' box")
+    if meta is None:
+        raise HeifHeaderError("Missing 'meta' box")
+    return ftyp, meta
+
+def _parse_primary_item(data: bytes, start: int) -> int:
+    version = data[start]
+    if version == 0:
+        return struct.unpack_from('>H', data, start + 4)[0]
+    return struct.unpack_from('>I', data, start + 4)[0]
+
+def _parse_ipma(data: bytes, start: int) -> Dict[int, List[int]]:
+    """Map item IDs to their (1-based) property indices."""
+    version = data[start]
+    flags = int.from_bytes(data[start + 1:start + 4], 'big')
+    offset = start + 4
+    entry_count = struct.unpack_from('>I', data, offset)[0]
+    offset += 4
+    associations = {}
+    for _ in range(entry_count):
+        if version < 1:
+            item_id = struct.unpack_from('>H', data, offset)[0]
+            offset += 2
+        else:
+            item_id = struct.unpack_from('>I', data, offset)[0]
+            offset += 4
+        count = data[offset]
+        offset += 1
+        indices = []
+        for _ in range(count):
+            if flags & 1:
+                indices.append(struct.unpack_from('>H', data, offset)[0] & 0x7FFF)
+                offset += 2
+            else:
+                indices.append(data[offset] & 0x7F)
+                offset += 1
+        associations[item_id] = indices
+    return associations
+
+def _parse_iinf(data: bytes, start: int, end: int) -> Dict[int, bytes]:
+    """Map item IDs to their item types."""
+    version = data[start]
+    offset = start + (6 if version == 0 else 8)
+    items = {}
+    for box_type, box_start, _ in _iter_boxes(data, offset, end):
+        if box_type != b'infe' or data[box_start] < 2:
+            continue
+        if data[box_start] == 2:
+            item_id = struct.unpack_from('>H', data, box_start + 4)[0]
+            type_offset = box_start + 8
+        else:
+            item_id = struct.unpack_from('>I', data, box_start + 4)[0]
+            type_offset = box_start + 10
+        items[item_id] = data[type_offset:type_offset + 4]
+    return items
+
+def _parse_iref(data: bytes, start: int, end: int) -> List[Tuple[bytes, int, List[int]]]:
+    """List (reference type, from item, to items) for each item reference."""
+    id_format, id_size = ('>H', 2) if data[start] == 0 else ('>I', 4)
+    references = []
+    for box_type, box_start, _ in _iter_boxes(data, start + 4, end):
+        from_item = struct.unpack_from(id_format, data, box_start)[0]
+        count = struct.unpack_from('>H', data, box_start + id_size)[0]
+        offset = box_start + id_size + 2
+        to_items = [struct.unpack_from(id_format, data, offset + i * id_size)[0] for i in range(count)]
+        references.append((box_type, from_item, to_items))
+    return references
+
+def _parse_iloc(data: bytes, start: int, end: int) -> Dict[int, Tuple[int, List[Tuple[int, int]]]]:
+    """Map item IDs to (construction method, [(offset, length), ...])."""
+    version = data[start]
+    offset = start + 4
+    offset_size, length_size = data[offset] >> 4, data[offset] & 15
+    base_offset_size, index_size = data[offset + 1] >> 4, data[offset + 1] & 15
+    offset += 2
+    id_size = 2 if version < 2 else 4
+    method_size = 2 if version in (1, 2) else 0
+    extent_index_size = index_size if version in (1, 2) else 0
+
+    def read(size: int) -> int:
+        nonlocal offset
+        if offset + size > end:
+            raise HeifHeaderError("Truncated 'iloc' box")
+        value = int.from_bytes(data[offset:offset + size], 'big') if size else 0
+        offset += size
+        return value
+
+    def read_count(count_size: int, entry_size: int) -> int:
+        # Counts come from the file: each entry takes at least one byte, so no more than what is left
+        count = read(count_size)
+        if count * max(1, entry_size) > end - offset:
+            raise HeifHeaderError("Corrupt 'iloc' box: count exceeds its size")
+        return count
+
+    item_size = id_size + method_size + 2 + base_offset_size + 2
+    extent_size = extent_index_size + offset_size + length_size
+    locations = {}
+    for _ in range(read_count(id_size, item_size)):
+        item_id = read(id_size)
+        construction_method = read(method_size) & 15
+        read(2)  # data_reference_index
+        base_offset = read(base_offset_size)
+        extents = []
+        for _ in range(read_count(2, extent_size)):
+            read(extent_index_size)
+            extent_offset = read(offset_size)
+            extents.append((base_offset + extent_offset, read(length_size)))
+        locations[item_id] = (construction_method, extents)
+    return locations
+
+class HeifMeta:
+    """
+    Item structure of a HEIF file, parsed from its 'meta' box.
+
+    Attributes:
+        brand: Major brand from the 'ftyp' box, e.g. 'heic'
+        data: Payload of the 'meta' box, which property offsets point into
+        primary_item: ID of the primary item
+        items: Item IDs mapped to their item types, e.g. b'hvc1' or b'grid'
+        references: (reference type, from item, to items) for each item reference
+        properties: (type, payload start, box end) of each property in 'ipco', in order
+        associations: Item IDs mapped to their 1-based property indices
+        locations: Item IDs mapped to (construction method, [(offset, length), ...])
+        item_data: Payload of the 'idat' box, for items stored in the 'meta' box
+    """
+
+    def __init__(self, brand: str, data: bytes):
+        self.brand = brand
+        self.data = data
+        self.primary_item: Optional[int] = None
+        self.items: Dict[int, bytes] = {}
+        self.references: List[Tuple[bytes, int, List[int]]] = []
+        self.properties: List[Tuple[bytes, int, int]] = []
+        self.associations: Dict[int, List[int]] = {}
+        self.locations: Dict[int, Tuple[int, List[Tuple[int, int]]]] = {}
+        self.item_data = b''
+
+    def item_properties(self, item_id: int) -> List[Tuple[bytes, bytes]]:
+        """List (type, payload) of the properties associated with an item, in association order."""
+        boxes = []
+        for index in self.associations.get(item_id, []):
+            if 1 <= index <= len(self.properties):
+                box_type, start, end = self.properties[index - 1]
+                boxes.append((box_type, self.data[start:end]))
+        return boxes
+
+    def read_item(self, f: BinaryIO, item_id: int) -> bytes:
+        """Read an item's data from the file, or from the 'idat' box if it is stored there."""
+        construction_method, extents = self.locations[item_id]
+        if construction_method == 1:
+            return b''.join(self.item_data[offset:offset + length] for offset, length in extents)
+        if construction_method != 0:
+            raise HeifHeaderError(f"Unsupported construction method {construction_method}")
+        data = bytearray()
+        for offset, length in extents:
+            f.seek(offset)
+            data += f.read(length)
+        return bytes(data)
+
+def read_heif_meta(f: BinaryIO) -> HeifMeta:
+    """
+    Parse the item structure of a HEIF file from an open binary file.
+
+    Args:
+        f: File object positioned at the start of the file
+
+    Returns:
+        HeifMeta with the file's items, references, properties and locations
+
+    Raises:
+        HeifHeaderError: If the box structure is missing or malformed
+    """
+    ftyp, data = _read_top_level(f)
+    if len(ftyp) < 4:
+        raise HeifHeaderError("Truncated 'ftyp' box")
+    meta = HeifMeta(ftyp[:4].decode('ascii', 'replace'), data)
+    try:
+        # 'meta' is a full box: skip version and flags
+        for box_type, start, end in _iter_boxes(data, 4):
+            if box_type == b'pitm':
+                meta.primary_item = _parse_primary_item(data, start)
+            elif box_type == b'iinf':
+                meta.items = _parse_iinf(data, start, end)
+            elif box_type == b'iref':
+                meta.references = _parse_iref(data, start, end)
+            elif box_type == b'iloc':
+                meta.locations = _parse_iloc(data, start, end)
+            elif box_type == b'idat':
+                meta.item_data = data[start:end]
+            elif box_type == b'iprp':
+                for sub_type, sub_start, sub_end in _iter_boxes(data, start, end):
+                    if sub_type == b'ipco':
+                        meta.properties = list(_iter_boxes(data, sub_start, sub_end))
+                    elif sub_type == b'ipma':
+                        meta.associations.update(_parse_ipma(data, sub_start))
+    except (struct.error, IndexError) as e:
+        raise HeifHeaderError(f"Malformed 'meta' box: {e}")
+    if meta.primary_item is None:
+        raise HeifHeaderError("Missing primary item")
+    return meta
+
+def parse_heif_header(f: BinaryIO) -> HeifHeader:
+    """
+    Parse the HEIF header from an open binary file.
+
+    Args:
+        f: File object positioned at the start of the file
+
+    Returns:
+        HeifHeader describing the primary image
+
+    Raises:
+        HeifHeaderError: If the box structure is missing or malformed
+    """
+    meta = read_heif_meta(f)
+
+    size = None
+    clean_aperture = None
+    rotated = False
+    bit_depth = 8
+    try:
+        for box_type, payload in meta.item_properties(meta.primary_item):
+            if box_type == b'ispe':
+                size = struct.unpack_from('>II', payload, 4)
+            elif box_type == b'clap':
+                clean_aperture = struct.unpack_from('>IIII', payload)
+            elif box_type == b'irot':
+                rotated = payload[0] & 1 == 1
+            elif box_type == b'pixi' and payload[4] > 0:
+                bit_depth = payload[5]
+    except (struct.error, IndexError) as e:
+        raise HeifHeaderError(f"Malformed item property: {e}")
+    if size is None:
+        raise HeifHeaderError("Primary item has no 'ispe' property")
+    # The coded size is padded for chroma subsampling; 'clap' crops it to the visible image
+    if clean_aperture is not None:
+        width_n, width_d, height_n, height_d = clean_aperture
+        if width_d and height_d:
+            size = ((width_n + width_d // 2) // width_d, (height_n + height_d // 2) // height_d)
+    if rotated:
+        size = (size[1], size[0])
+
+    # Thumbnails, grid tiles and auxiliary images (alpha, depth) are not images of their own
+    thumbnails = {from_item for ref_type, from_item, _ in meta.references if ref_type == b'thmb'}
+    hidden = set(thumbnails)
+    tile_count = 1
+    for ref_type, from_item, to_items in meta.references:
+        if ref_type == b'auxl':
+            hidden.add(from_item)
+        elif ref_type == b'dimg':
+            hidden.update(to_items)
+            if from_item == meta.primary_item:
+                tile_count = len(to_items)
+    image_count = sum(1 for item_id, item_type in meta.items.items()
+                      if item_type in IMAGE_ITEM_TYPES and item_id not in hidden)
+
+    return HeifHeader(
+        meta.brand, size[0], size[1],
+        bit_depth=bit_depth,
+        image_count=max(1, image_count),
+        thumbnail_count=len(thumbnails),
+        is_grid=meta.items.get(meta.primary_item) == b'grid',
+        tile_count=tile_count,
+    )
+
+def read_heif_header(path: str) -> HeifHeader:
+    """
+    Read the HEIF header of a file without decoding any pixels.
+
+    Args:
+        path: Path to a HEIC/HEIF file
+
+    Returns:
+        HeifHeader describing the primary image
+
+    Raises:
+        HeifHeaderError: If the file is not a readable HEIF file
+        OSError: If the file cannot be opened
+    """
+    with open(path, 'rb') as f:
+        return parse_heif_header(f)
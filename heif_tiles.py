@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - HEIF Grid Tiles
+Decodes grid HEIF images one tile at a time to cap peak memory.
+
+Phones store large photos as a grid of small HEVC tiles (512x512 on
+iPhones). Decoding the grid as one image makes libheif hold the whole frame
+twice, as YCbCr planes and as interleaved RGB, before Pillow copies it once
+more. Each tile, however, is a self-contained HEVC image: here a tile is
+wrapped in a minimal single-image HEIF file of its own, decoded, and handed
+on as part of a strip of output rows, so only one row of tiles is decoded
+at a time.
+
+PNG output is streamed strip by strip, keeping peak memory at a few tile
+rows whatever the image size. The JPEG, WebP and AVIF encoders in Pillow
+need the whole image at once (JPEG's optimized Huffman coding makes two
+passes over it), so for those the tiles are assembled into a single output
+image, which still avoids libheif's full-frame buffers.
+
+Grids with alpha, mirroring or cropping properties are left to the regular
+full-image decode.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import io
+import struct
+import zlib
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import pillow_heif
+from PIL import Image, ImageChops
+
+try:
+    from .heif_header import HeifHeaderError, read_heif_meta
+except ImportError:
+    from heif_header import HeifHeaderError, read_heif_meta
+
+# Auxiliary image types that mark an alpha plane, which tile decoding does not handle
+ALPHA_AUX_TYPES = {
+    b'urn:mpeg:avc:2015:auxid:1',
+    b'urn:mpeg:hevc:2015:auxid:1',
+    b'urn:mpeg:mpegB:cicp:systems:auxiliary:alpha',
+}
+# Properties on the grid item that change its geometry in ways not applied tile by tile
+UNSUPPORTED_TRANSFORMS = {b'imir', b'clap'}
+# zlib level for streamed PNG output, matching Pillow's optimize=True
+PNG_COMPRESS_LEVEL = 9
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def _full_box(box_type: bytes, version: int, flags: int, payload: bytes) -> bytes:
+    return _box(box_type, struct.pack('>I', (version << 24) | flags) + payload)
+
+class GridImage:
+    """
+    Primary grid image of a HEIF file, decodable one tile at a time.
+
+    Use open_grid() to create one. size and mode describe the image as a
+    full decode would return it, after rotation.
+    """
+
+    def __init__(self, f: BinaryIO, rows: int, columns: int, grid_size: Tuple[int, int],
+                 tile_size: Tuple[int, int], tiles: List[Tuple[List[Tuple[int, int]], List[bytes]]],
+                 rotation: int, info: dict):
+        self._f = f
+        self.rows = rows
+        self.columns = columns
+        self.grid_size = grid_size
+        self.tile_size = tile_size
+        # Per tile in row-major order: file extents of its coded data and its property boxes
+        self._tiles = tiles
+        # Counter-clockwise quarter turns applied after the tiles are put together
+        self.rotation = rotation
+        self.info = info
+        self.mode = 'RGB'
+        width, height = grid_size
+        self.size = (height, width) if rotation % 2 else (width, height)
+
+    def decode_tile(self, row: int, column: int) -> Image.Image:
+        """Decode one tile, cropped to the part inside the grid but not yet rotated."""
+        extents, properties = self._tiles[row * self.columns + column]
+        data = bytearray()
+        for offset, length in extents:
+            self._f.seek(offset)
+            data += self._f.read(length)
+        heif_file = pillow_heif.open_heif(io.BytesIO(_single_image_heif(bytes(data), properties)),
+                                          convert_hdr_to_8bit=True)
+        tile = heif_file[0].to_pillow()
+        if tile.mode != self.mode:
+            tile = tile.convert(self.mode)
+        tile_width, tile_height = self.tile_size
+        grid_width, grid_height = self.grid_size
+        visible = (min(tile_width, grid_width - column * tile_width),
+                   min(tile_height, grid_height - row * tile_height))
+        if tile.size != visible:
+            tile = tile.crop((0, 0) + visible)
+        return tile
+
+    def strips(self) -> Iterator[Image.Image]:
+        """
+        Yield the image as horizontal strips from top to bottom, already rotated.
+
+        Without rotation each strip is one row of tiles; with a quarter turn it
+        is one column of tiles, since that is what ends up as a row of output.
+        """
+        tile_width, tile_height = self.tile_size
+        grid_width, grid_height = self.grid_size
+        if self.rotation % 2 == 0:
+            order = range(self.rows) if self.rotation == 0 else reversed(range(self.rows))
+            for row in order:
+                height = min(tile_height, grid_height - row * tile_height)
+                strip = Image.new(self.mode, (grid_width, height))
+                for column in range(self.columns):
+                    tile = self.decode_tile(row, column)
+                    if self.rotation == 2:
+                        tile = tile.transpose(Image.Transpose.ROTATE_180)
+                        x = grid_width - column * tile_width - tile.width
+                    else:
+                        x = column * tile_width
+                    strip.paste(tile, (x, 0))
+                    tile.close()
+                yield strip
+        else:
+            # A counter-clockwise quarter turn puts the last tile column at the top, three puts the first there
+            order = reversed(range(self.columns)) if self.rotation == 1 else range(self.columns)
+            transpose = Image.Transpose.ROTATE_90 if self.rotation == 1 else Image.Transpose.ROTATE_270
+            for column in order:
+                width = min(tile_width, grid_width - column * tile_width)
+                strip = Image.new(self.mode, (grid_height, width))
+                for row in range(self.rows):
+                    tile = self.decode_tile(row, column).transpose(transpose)
+                    if self.rotation == 1:
+                        x = row * tile_height
+                    else:
+                        x = grid_height - row * tile_height - tile.width
+                    strip.paste(tile, (x, 0))
+                    tile.close()
+                yield strip
+
+    def assemble(self) -> Image.Image:
+        """Decode every tile into one image, holding at most one strip of tiles besides it."""
+        img = Image.new(self.mode, self.size)
+        y = 0
+        for strip in self.strips():
+            img.paste(strip, (0, y))
+            y += strip.height
+            strip.close()
+        img.info.update(self.info)
+        return img
+
+    def save_png(self, fp: BinaryIO, compress_level: int = PNG_COMPRESS_LEVEL):
+        """
+        Write the image as PNG, compressing each strip as soon as it is decoded.
+
+        Rows use the 'Up' filter, which is computed a strip at a time with
+        Pillow's channel arithmetic and suits photographs well.
+        """
+        width, height = self.size
+        fp.write(b'\x89PNG\r\n\x1a\n')
+        _png_chunk(fp, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        icc_profile = self.info.get('icc_profile')
+        if icc_profile:
+            _png_chunk(fp, b'iCCP', b'ICC Profile\0\0' + zlib.compress(icc_profile))
+        compressor = zlib.compressobj(compress_level)
+        row_bytes = width * 3
+        previous_row = None
+        for strip in self.strips():
+            # Up filter: each row minus the row above it, modulo 256
+            above = Image.new(self.mode, strip.size)
+            if previous_row is not None:
+                above.paste(previous_row, (0, 0))
+            if strip.height > 1:
+                above.paste(strip.crop((0, 0, width, strip.height - 1)), (0, 1))
+            filtered = ImageChops.subtract_modulo(strip, above).tobytes()
+            previous_row = strip.crop((0, strip.height - 1, width, strip.height))
+            strip.close()
+            above.close()
+            # Filter type 2 ('Up') before every row
+            rows = bytearray(len(filtered) + strip.height)
+            view = memoryview(filtered)
+            for index in range(strip.height):
+                start = index * (row_bytes + 1)
+                rows[start] = 2
+                rows[start + 1:start + 1 + row_bytes] = view[index * row_bytes:(index + 1) * row_bytes]
+            compressed = compressor.compress(rows)
+            if compressed:
+                _png_chunk(fp, b'IDAT', compressed)
+        _png_chunk(fp, b'IDAT', compressor.flush())
+        _png_chunk(fp, b'IEND', b'')
+
+def _png_chunk(fp: BinaryIO, chunk_type: bytes, data: bytes):
+    fp.write(struct.pack('>I', len(data)) + chunk_type + data +
+             struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+def _single_image_heif(data: bytes, properties: List[bytes]) -> bytes:
+    """Wrap the coded data of one HEVC image item and its property boxes in a minimal HEIF file."""
+    ftyp = _box(b'ftyp', b'heic' + struct.pack('>I', 0) + b'mif1heic')
+    property_count = len(properties)
+
+    def meta_box(data_offset: int) -> bytes:
+        associations = bytes((0x80 if index == 1 else 0) | index for index in range(1, property_count + 1))
+        return _full_box(b'meta', 0, 0, b''.join([
+            _full_box(b'hdlr', 0, 0, struct.pack('>I', 0) + b'pict' + bytes(12) + b'\0'),
+            _full_box(b'pitm', 0, 0, struct.pack('>H', 1)),
+            _full_box(b'iinf', 0, 0, struct.pack('>H', 1) +
+                      _full_box(b'infe', 2, 0, struct.pack('>HH', 1, 0) + b'hvc1' + b'\0')),
+            _full_box(b'iloc', 0, 0, bytes((0x44, 0x00)) + struct.pack('>HHHHII', 1, 1, 0, 1, data_offset, len(data))),
+            _box(b'iprp', _box(b'ipco', b''.join(properties)) +
+                 _full_box(b'ipma', 0, 0, struct.pack('>IHB', 1, 1, property_count) + associations)),
+        ]))
+
+    # The meta box has the same length whatever offset it records
+    data_offset = len(ftyp) + len(meta_box(0)) + 8
+    return ftyp + meta_box(data_offset) + _box(b'mdat', data)
+
+def open_grid(f: BinaryIO) -> Optional[GridImage]:
+    """
+    Prepare tile-by-tile decoding of a HEIF file's primary image.
+
+    Args:
+        f: Seekable binary file positioned at the start of the HEIF file;
+            it must stay open while the GridImage is used
+
+    Returns:
+        A GridImage, or None if the primary image is not an HEVC grid
+        without alpha, mirroring or cropping, which the caller then decodes
+        in one piece
+    """
+    try:
+        f.seek(0)
+        meta = read_heif_meta(f)
+        primary_item = meta.primary_item
+        if meta.items.get(primary_item) != b'grid':
+            return None
+        # The grid descriptor; pillow_heif reports the layout after rotation, so it is read here
+        descriptor = meta.read_item(f, primary_item)
+        rows, columns = descriptor[2] + 1, descriptor[3] + 1
+        grid_size = struct.unpack_from('>II' if descriptor[1] & 1 else '>HH', descriptor, 4)
+
+        # Checked only now, as it reads the whole file; the image's mode is known after conversion to 8 bits
+        f.seek(0)
+        heif_file = pillow_heif.open_heif(f, convert_hdr_to_8bit=True)
+        primary = heif_file[heif_file.primary_index]
+        if primary.has_alpha or primary.mode != 'RGB':
+            return None
+    except (HeifHeaderError, struct.error, IndexError, KeyError, ValueError, RuntimeError, OSError):
+        return None
+
+    rotation = 0
+    grid_properties = meta.item_properties(primary_item)
+    for box_type, payload in grid_properties:
+        if box_type in UNSUPPORTED_TRANSFORMS:
+            return None
+        if box_type == b'irot':
+            rotation = payload[0] & 3
+    for ref_type, from_item, to_items in meta.references:
+        if ref_type == b'auxl' and primary_item in to_items:
+            for box_type, payload in meta.item_properties(from_item):
+                if box_type == b'auxC' and payload[4:].split(b'\0')[0] in ALPHA_AUX_TYPES:
+                    return None
+
+    tile_ids = next((to_items for ref_type, from_item, to_items in meta.references
+                     if ref_type == b'dimg' and from_item == primary_item), [])
+    if len(tile_ids) != rows * columns:
+        return None
+    # Colour information on the grid applies to its tiles
+    grid_colour = [_box(box_type, payload) for box_type, payload in grid_properties if box_type == b'colr']
+    tiles = []
+    tile_size = None
+    for tile_id in tile_ids:
+        construction_method, extents = meta.locations.get(tile_id, (None, []))
+        tile_properties = meta.item_properties(tile_id)
+        if meta.items.get(tile_id) != b'hvc1' or construction_method != 0 or not extents:
+            return None
+        if not tile_properties or tile_properties[0][0] != b'hvcC':
+            return None
+        extent = next((struct.unpack_from('>II', payload, 4) for box_type, payload in tile_properties
+                       if box_type == b'ispe'), None)
+        if extent is None or tile_size not in (None, extent):
+            return None
+        tile_size = extent
+        boxes = [_box(box_type, payload) for box_type, payload in tile_properties]
+        if not any(box_type == b'colr' for box_type, _ in tile_properties):
+            boxes += grid_colour
+        tiles.append((extents, boxes))
+
+    info = {key: value for key, value in primary.info.items()
+            if key in ('exif', 'xmp', 'icc_profile', 'icc_profile_type', 'nclx_profile')}
+    if tile_size[0] * columns < grid_size[0] or tile_size[1] * rows < grid_size[1]:
+        return None
+    return GridImage(f, rows, columns, grid_size, tile_size, tiles, rotation, info)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Job Queue
+Priority queue of files for a conversion run that can grow while it runs.
+
+Files are handed out highest priority first and in insertion order within a
+priority, so files the user adds or selects during a run can jump ahead of
+the initial batch. A run ends when its queue runs dry; from then on the
+queue refuses new files, so the caller knows to keep them for the next run
+instead of losing them to a worker that is already shutting down.
+
+Cancelling empties the queue at once and sets an event that the conversion
+core checks between stages, so a file in progress is abandoned at its next
+stage boundary rather than at the end of the batch.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import heapq
+import itertools
+import threading
+from typing import Dict, List, Optional
+
+# Priority of the files a run starts with, and of files added by the user while it runs
+PRIORITY_NORMAL = 0
+PRIORITY_USER = 10
+
+class JobQueue:
+    """Thread-safe priority queue of file paths for one conversion run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap: List[list] = []
+        # Live heap entry per queued path; superseded entries are marked invalid and skipped
+        self._entries: Dict[str, list] = {}
+        self._counter = itertools.count()
+        self._closed = False
+        self.cancel_event = threading.Event()
+
+    def put(self, path: str, priority: int = PRIORITY_NORMAL) -> bool:
+        """
+        Queue a file, or raise the priority of a file that is already queued.
+
+        Returns:
+            False if the run has ended or was cancelled and the file was not queued
+        """
+        with self._lock:
+            return self._put_locked(path, priority)
+
+    def prioritize(self, path: str, priority: int = PRIORITY_USER) -> bool:
+        """Move a queued file ahead; returns False if it is not waiting in the queue."""
+        # Checked and queued under one lock, so a file a worker has just taken is not queued again
+        with self._lock:
+            if path not in self._entries:
+                return False
+            return self._put_locked(path, priority)
+
+    def _put_locked(self, path: str, priority: int) -> bool:
+        if self._closed:
+            return False
+        entry = self._entries.get(path)
+        if entry is not None:
+            if -entry[0] >= priority:
+                return True
+            entry[-1] = False
+        entry = [-priority, next(self._counter), path, True]
+        self._entries[path] = entry
+        heapq.heappush(self._heap, entry)
+        return True
+
+    def get(self) -> Optional[str]:
+        """
+        Take the next file to convert.
+
+        Returns:
+            The path, or None once the queue is empty or cancelled, after
+            which the queue is closed to new files
+        """
+        with self._lock:
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                if entry[-1]:
+                    del self._entries[entry[2]]
+                    return entry[2]
+            self._closed = True
+            return None
+
+    def cancel(self) -> List[str]:
+        """
+        Stop the run without waiting for it.
+
+        Returns:
+            The files that were still waiting, in the order they would have run
+        """
+        self.cancel_event.set()
+        with self._lock:
+            self._closed = True
+            dropped = [entry[2] for entry in sorted(self._heap) if entry[-1]]
+            self._heap.clear()
+            self._entries.clear()
+            return dropped
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
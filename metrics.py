@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Run Metrics
+Collects throughput, size and latency figures for a conversion run.
+
+The collected figures can be rendered as a JSON run report or written as a
+Prometheus text-format file for a node_exporter textfile collector.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+# Upper bounds (seconds) of the per-stage latency histogram buckets
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = 'heic_converter'
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list, 0.0 for an empty one."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus bucket layout."""
+
+    def __init__(self, buckets: Sequence[float] = STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'buckets': {str(bound): n for bound, n in zip(self.buckets, self.counts)},
+        }
+
+class RunMetrics:
+    """
+    Thread-safe accumulator for the results of one conversion run.
+
+    Args:
+        workers: Number of workers converting in parallel, used for utilisation
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._lock = threading.Lock()
+        self.succeeded = 0
+        self.failed = 0
+        self.passthrough = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy_seconds = 0.0
+        self.error_classes: Dict[str, int] = {}
+        self.errors: List[dict] = []
+        self.stage_latency: Dict[str, Histogram] = {}
+        self.schedule = None
+        self.adaptive: Optional[List[dict]] = None
+
+    def set_schedule(self, stats):
+        """Attach a scheduler.ScheduleStats so the report includes makespan and tail latency."""
+        self.schedule = stats
+
+    def set_adaptive(self, decisions: List[dict], workers: Optional[float] = None):
+        """
+        Attach the decisions of an adaptive.AdaptiveController to the report.
+
+        Args:
+            decisions: The controller's decisions
+            workers: Time-weighted mean of the active workers, which replaces
+                the configured count in utilisation and the workers figure
+        """
+        self.adaptive = decisions
+        if workers is not None:
+            self.workers = workers
+
+    def record(self, result):
+        """Add a core.ConversionResult to the run totals."""
+        with self._lock:
+            for stage, seconds in result.stage_times.items():
+                self.stage_latency.setdefault(stage, Histogram()).observe(seconds)
+            self.busy_seconds += sum(result.stage_times.values())
+            if result.success:
+                self.succeeded += 1
+                if result.passthrough:
+                    self.passthrough += 1
+                self.bytes_in += result.bytes_in
+                self.bytes_out += result.bytes_out
+            else:
+                self.failed += 1
+                error_class = result.error_class or 'Exception'
+                self.error_classes[error_class] = self.error_classes.get(error_class, 0) + 1
+                self.errors.append({
+                    'file': result.source,
+                    'class': error_class,
+                    'message': result.message,
+                })
+
+    def finish(self):
+        """Stop the run clock; elapsed time is frozen from here on."""
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        end = self._end if self._end is not None else time.perf_counter()
+        return end - self._start
+
+    @property
+    def files_per_second(self) -> float:
+        return self.succeeded / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def compression_ratio(self) -> float:
+        """Output bytes divided by input bytes over all converted files."""
+        return self.bytes_out / self.bytes_in if self.bytes_in else 0.0
+
+    @property
+    def worker_utilisation(self) -> float:
+        """Fraction of the available worker time spent decoding, encoding or writing."""
+        capacity = self.elapsed * self.workers
+        return min(1.0, self.busy_seconds / capacity) if capacity > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        """Build the JSON run report."""
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'elapsed_seconds': round(self.elapsed, 6),
+                'workers': round(self.workers, 3),
+                'files': {
+                    'total': self.succeeded + self.failed,
+                    'succeeded': self.succeeded,
+                    'failed': self.failed,
+                    'passthrough': self.passthrough,
+                },
+                'files_per_second': round(self.files_per_second, 3),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'compression_ratio': round(self.compression_ratio, 4),
+                'worker_utilisation': round(self.worker_utilisation, 4),
+                'stage_latency_seconds': {
+                    stage: histogram.to_dict() for stage, histogram in sorted(self.stage_latency.items())
+                },
+                'error_classes': dict(sorted(self.error_classes.items())),
+                'errors': list(self.errors),
+                'schedule': self.schedule.to_dict() if self.schedule else None,
+                'adaptive_decisions': list(self.adaptive) if self.adaptive is not None else None,
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the run totals in the Prometheus text exposition format."""
+        p = METRIC_PREFIX
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+
+        with self._lock:
+            metric('files_total', 'counter', 'Files processed, by outcome.')
+            lines.append(f'{p}_files_total{{status="success"}} {self.succeeded}')
+            lines.append(f'{p}_files_total{{status="error"}} {self.failed}')
+
+            metric('passthrough_total', 'counter', 'Files copied without re-encoding.')
+            lines.append(f'{p}_passthrough_total {self.passthrough}')
+
+            metric('bytes_total', 'counter', 'Bytes read from inputs and written to outputs.')
+            lines.append(f'{p}_bytes_total{{direction="in"}} {self.bytes_in}')
+            lines.append(f'{p}_bytes_total{{direction="out"}} {self.bytes_out}')
+
+            metric('errors_total', 'counter', 'Failed files, by error class.')
+            for error_class, count in sorted(self.error_classes.items()):
+                lines.append(f'{p}_errors_total{{class="{_escape(error_class)}"}} {count}')
+
+            metric('stage_duration_seconds', 'histogram', 'Per-file latency of each conversion stage.')
+            for stage, histogram in sorted(self.stage_latency.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{p}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{p}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{p}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{p}_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            metric('files_per_second', 'gauge', 'Converted files per second over the run.')
+            lines.append(f'{p}_files_per_second {self.files_per_second:.6f}')
+
+            metric('compression_ratio', 'gauge', 'Output bytes divided by input bytes.')
+            lines.append(f'{p}_compression_ratio {self.compression_ratio:.6f}')
+
+            metric('worker_utilisation', 'gauge', 'Fraction of worker time spent converting.')
+            lines.append(f'{p}_worker_utilisation {self.worker_utilisation:.6f}')
+
+            metric('workers', 'gauge', 'Number of conversion workers (time-weighted mean when adaptive).')
+            lines.append(f'{p}_workers {self.workers:g}')
+
+            metric('run_duration_seconds', 'gauge', 'Wall-clock duration of the run.')
+            lines.append(f'{p}_run_duration_seconds {self.elapsed:.6f}')
+
+            if self.schedule:
+                schedule = self.schedule.to_dict()
+                metric('job_duration_seconds', 'summary', 'Per-file conversion latency.')
+                for quantile in ('p50', 'p95', 'p99'):
+                    value = schedule['job_latency_seconds'][quantile]
+                    lines.append(f'{p}_job_duration_seconds{{quantile="0.{quantile[1:]}"}} {value}')
+                lines.append(f'{p}_job_duration_seconds_sum {sum(self.schedule.job_seconds):.6f}')
+                lines.append(f'{p}_job_duration_seconds_count {len(self.schedule.job_seconds)}')
+
+                metric('schedule_efficiency', 'gauge', 'Ideal makespan divided by actual makespan.')
+                lines.append(f'{p}_schedule_efficiency {schedule["efficiency"]}')
+
+                metric('steals_total', 'counter', 'Jobs taken from another worker queue.')
+                lines.append(f'{p}_steals_total {schedule["steals"]}')
+
+            if self.adaptive is not None:
+                metric('adaptive_decisions_total', 'counter', 'Concurrency changes made by the adaptive controller.')
+                lines.append(f'{p}_adaptive_decisions_total {len(self.adaptive)}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """Write the metrics file atomically so a collector never reads a partial file."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Read-ahead
+Reads upcoming input files ahead of the decode workers.
+
+On network storage each file open stalls a worker for a round trip before
+decoding can begin. The prefetcher follows the order in which the scheduler
+hands out jobs and keeps the next files in flight on a few reader threads,
+bounded by a file count and, for in-memory reads, by bytes. Files on network
+file systems are read into memory; on local disks the kernel is asked to
+read them into the page cache with posix_fadvise instead, which costs no
+process memory.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Set
+
+PREFETCH_MODES = ('auto', 'memory', 'advise')
+DEFAULT_PREFETCH_BYTES = 256 * 1024 * 1024
+DEFAULT_READER_THREADS = 4
+
+NETWORK_FILESYSTEMS = {
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', '9p', 'afs', 'ceph', 'glusterfs', 'lustre',
+    'fuse.sshfs', 'fuse.rclone', 'fuse.s3fs', 'fuse.gcsfuse', 'fuse.glusterfs', 'fuse.cephfs',
+}
+
+def _mount_types() -> Dict[str, str]:
+    """Map mount points to file system types (Linux only; empty elsewhere)."""
+    mounts = {}
+    try:
+        with open('/proc/self/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    # Spaces in mount points are escaped as \040
+                    mounts[fields[1].replace('\\040', ' ')] = fields[2]
+    except OSError:
+        pass
+    return mounts
+
+def is_network_path(path: str, mounts: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Whether a path lives on a network file system.
+
+    Without mount information (anything but Linux) every path is treated as
+    networked, since reading into memory helps there and is harmless locally.
+    """
+    mounts = _mount_types() if mounts is None else mounts
+    if not mounts:
+        return True
+    path = os.path.realpath(path)
+    best = ''
+    for mount_point in mounts:
+        prefix = mount_point.rstrip('/') + '/'
+        if (path == mount_point or path.startswith(prefix)) and len(mount_point) > len(best):
+            best = mount_point
+    return mounts.get(best, '') in NETWORK_FILESYSTEMS
+
+class _Entry:
+    """A file the readers have started on: its bytes once read, if read into memory."""
+
+    def __init__(self):
+        self.done = False
+        # Set once the read has room in the byte budget and is under way
+        self.reading = False
+        # Set when the worker arrived first and reads the file itself
+        self.cancelled = False
+        self.data: Optional[bytes] = None
+
+class Prefetcher:
+    """
+    Read files ahead of the workers that consume them.
+
+    Args:
+        paths: Files in the order they are expected to be consumed
+        depth: Most files read ahead and not yet consumed
+        max_bytes: Most bytes held in memory for files not yet consumed
+        threads: Number of reader threads
+        mode: 'memory' reads files into memory, 'advise' only asks the kernel
+            to read them ahead, 'auto' picks per file by its file system
+    """
+
+    def __init__(self, paths: Sequence[str], depth: int = 8, max_bytes: int = DEFAULT_PREFETCH_BYTES,
+                 threads: int = DEFAULT_READER_THREADS, mode: str = 'auto'):
+        if mode not in PREFETCH_MODES:
+            raise ValueError(f"Unknown prefetch mode {mode!r}, expected one of {', '.join(PREFETCH_MODES)}")
+        if mode == 'advise' and not hasattr(os, 'posix_fadvise'):
+            mode = 'memory'
+        self.paths: List[str] = list(paths)
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._mounts = _mount_types() if mode == 'auto' else {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._next = 0
+        self._entries: Dict[str, _Entry] = {}
+        self._consumed: Set[str] = set()
+        self._held_bytes = 0
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.threads = 0
+        self._threads: List[threading.Thread] = []
+        self._running: Set[int] = set()
+        self.set_threads(threads)
+
+    def set_threads(self, count: int) -> int:
+        """
+        Change the number of reader threads; surplus threads exit after their current read.
+
+        Returns:
+            The new number of threads
+        """
+        with self._changed:
+            self.threads = max(1, count)
+            for index in range(self.threads):
+                if index not in self._running:
+                    self._running.add(index)
+                    thread = threading.Thread(target=self._run, args=(index,), name=f"prefetch-{index}",
+                                              daemon=True)
+                    self._threads.append(thread)
+                    thread.start()
+            self._changed.notify_all()
+            return self.threads
+
+    def _use_memory(self, path: str) -> bool:
+        if self.mode == 'auto':
+            return not hasattr(os, 'posix_fadvise') or is_network_path(path, self._mounts)
+        return self.mode == 'memory'
+
+    def _run(self, index: int):
+        while True:
+            with self._changed:
+                while (not self._closed and index < self.threads and self._next < len(self.paths)
+                       and len(self._entries) >= self.depth):
+                    self._changed.wait()
+                if self._closed or index >= self.threads or self._next >= len(self.paths):
+                    self._running.discard(index)
+                    return
+                path = self.paths[self._next]
+                self._next += 1
+                if path in self._consumed or path in self._entries:
+                    # A worker got to it first
+                    continue
+                entry = self._entries[path] = _Entry()
+
+            data = None
+            try:
+                if self._use_memory(path):
+                    data = self._read(path, entry)
+                else:
+                    entry.reading = True
+                    self._advise(path)
+            except OSError:
+                # The worker reads the file itself and reports the error
+                pass
+            with self._changed:
+                entry.data = data
+                entry.done = True
+                self._changed.notify_all()
+
+    def _read(self, path: str, entry: _Entry) -> Optional[bytes]:
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return None
+        with self._changed:
+            # Wait for room within the byte budget; an empty budget always admits one file
+            while (not self._closed and not entry.cancelled and self._held_bytes
+                   and self._held_bytes + size > self.max_bytes):
+                self._changed.wait()
+            if self._closed or entry.cancelled:
+                return None
+            self._held_bytes += size
+            entry.reading = True
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._changed:
+                self._held_bytes -= size
+                self._changed.notify_all()
+            raise
+        if len(data) != size:
+            # The file changed while being read: account for what was actually read
+            with self._changed:
+                self._held_bytes += len(data) - size
+        return data
+
+    @staticmethod
+    def _advise(path: str):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+    def take(self, path: str) -> Optional[bytes]:
+        """
+        Hand over a file to the worker about to decode it.
+
+        Waits if the file is being read right now. A file still waiting for
+        room in the byte budget is left to the caller, so a worker never waits
+        on bytes held for files it has not reached yet.
+
+        Returns:
+            The file's bytes if they were read into memory, otherwise None,
+            in which case the caller opens the file itself (the page cache
+            may already hold it)
+        """
+        with self._changed:
+            self._consumed.add(path)
+            entry = self._entries.get(path)
+            if entry is None:
+                self.misses += 1
+                return None
+            while not entry.done:
+                if not entry.reading:
+                    entry.cancelled = True
+                    del self._entries[path]
+                    self.misses += 1
+                    self._changed.notify_all()
+                    return None
+                self._changed.wait()
+            del self._entries[path]
+            if entry.data is not None:
+                self._held_bytes -= len(entry.data)
+            self.hits += 1
+            self._changed.notify_all()
+            return entry.data
+
+    def close(self):
+        """Stop the reader threads and drop anything not yet consumed."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._entries.clear()
+        self._held_bytes = 0
+
+    def __enter__(self) -> 'Prefetcher':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Batch Pre-scan
+Estimates the size and duration of a conversion job from HEIF headers alone.
+
+Headers are read in parallel without decoding any pixels, which gives the
+pixel count, bit depth, image and thumbnail counts of every file and flags
+the ones that are unreadable. Runtime is estimated from a throughput figure
+measured once per machine by converting a synthetic image, and output size
+from typical bytes per pixel of each output format.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from PIL import Image, ImageDraw
+import PIL
+import pillow_heif
+
+try:
+    from . import core
+    from .heif_header import HeifHeader, HeifHeaderError, read_heif_header
+    from .metrics import percentile
+except ImportError:
+    import core
+    from heif_header import HeifHeader, HeifHeaderError, read_heif_header
+    from metrics import percentile
+
+# Typical output bytes per pixel for camera photos at the registry's default settings
+TYPICAL_BYTES_PER_PIXEL = {
+    'jpg': 0.45,
+    'png': 1.8,
+    'webp': 0.2,
+    'avif': 0.12,
+}
+
+# Megapixel bucket upper bounds for the size distribution
+SIZE_BUCKETS = (2, 8, 16, 32, 64)
+
+CALIBRATION_SIZE = (2048, 1536)
+
+class ScanEntry:
+    """Header information, or the reason it could not be read, for one file."""
+
+    def __init__(self, path: str, size: int = 0, header: Optional[HeifHeader] = None,
+                 error: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.header = header
+        self.error = error
+
+def scan_file(path: str) -> ScanEntry:
+    """Read the HEIF header of one file, capturing any error in the entry."""
+    try:
+        size = os.path.getsize(path)
+        return ScanEntry(path, size, header=read_heif_header(path))
+    except (HeifHeaderError, OSError) as e:
+        return ScanEntry(path, error=str(e))
+
+def scan_files(paths: Iterable[str], workers: int = 16) -> List[ScanEntry]:
+    """
+    Read the headers of many files in parallel.
+
+    Header reads are small and dominated by storage latency, so more threads
+    than CPUs pays off, especially on network storage.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(scan_file, paths))
+
+def _calibration_path() -> str:
+    return os.path.join(core.cache_dir(), 'calibration.json')
+
+def calibrate(output_format: str = 'jpg', force: bool = False) -> float:
+    """
+    Measure single-worker conversion throughput on this machine.
+
+    A synthetic HEIC is converted with the real conversion path and the best
+    of three runs is kept. Results are cached per output format and codec
+    versions, so the measurement only runs once per machine.
+
+    Args:
+        output_format: Output format to measure
+        force: Measure again even if a cached result exists
+
+    Returns:
+        Megapixels converted per second by one worker
+    """
+    key = f"{output_format}:pillow-{PIL.__version__}:pillow_heif-{pillow_heif.__version__}"
+    cache_path = _calibration_path()
+    cache: Dict[str, float] = {}
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if key in cache and not force:
+        return cache[key]
+
+    tmp = tempfile.mkdtemp(prefix='heic_calibration_')
+    try:
+        width, height = CALIBRATION_SIZE
+        img = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+        draw = ImageDraw.Draw(img)
+        for x in range(0, width, 64):
+            draw.line([(x, 0), (width - x, height)], fill=(x % 256, 96, 192), width=3)
+        source = os.path.join(tmp, 'calibration.heic')
+        img.save(source, quality=80)
+
+        best = None
+        for _ in range(3):
+            start = time.perf_counter()
+            success, message = core.convert_file(source, output_format, os.path.join(tmp, 'out'))
+            elapsed = time.perf_counter() - start
+            if not success:
+                raise RuntimeError(message)
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    megapixels_per_second = width * height / 1_000_000 / best
+    cache[key] = megapixels_per_second
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        # A read-only home directory only costs a re-measurement next time
+        pass
+    return megapixels_per_second
+
+def summarize(entries: List[ScanEntry], output_format: str, workers: int,
+              megapixels_per_second: float) -> dict:
+    """
+    Summarize scanned files and estimate the cost of converting them.
+
+    Args:
+        entries: Results of scan_files()
+        output_format: Planned output format
+        workers: Planned number of parallel workers
+        megapixels_per_second: Single-worker throughput from calibrate()
+
+    Returns:
+        Dictionary suitable for the JSON report
+    """
+    readable = [entry for entry in entries if entry.header]
+    megapixels = sorted(entry.header.pixels / 1_000_000 for entry in readable)
+    total_pixels = sum(entry.header.pixels for entry in readable)
+
+    distribution = {}
+    for bound in SIZE_BUCKETS:
+        distribution[f"<={bound}MP"] = 0
+    distribution[f">{SIZE_BUCKETS[-1]}MP"] = 0
+    for value in megapixels:
+        label = next((f"<={bound}MP" for bound in SIZE_BUCKETS if value <= bound), f">{SIZE_BUCKETS[-1]}MP")
+        distribution[label] += 1
+
+    bit_depths: Dict[str, int] = {}
+    for entry in readable:
+        bit_depths[str(entry.header.bit_depth)] = bit_depths.get(str(entry.header.bit_depth), 0) + 1
+
+    # Threads beyond the core count do not add conversion throughput
+    effective_workers = max(1, min(workers, os.cpu_count() or 1))
+    seconds = total_pixels / 1_000_000 / megapixels_per_second / effective_workers if megapixels_per_second else 0.0
+
+    return {
+        'files': len(entries),
+        'readable': len(readable),
+        'corrupt': [{'file': entry.path, 'error': entry.error} for entry in entries if entry.error],
+        'input_bytes': sum(entry.size for entry in readable),
+        'total_megapixels': round(total_pixels / 1_000_000, 3),
+        'megapixels': {
+            'min': round(megapixels[0], 3) if megapixels else 0.0,
+            'p50': round(percentile(megapixels, 0.50), 3),
+            'p90': round(percentile(megapixels, 0.90), 3),
+            'max': round(megapixels[-1], 3) if megapixels else 0.0,
+        },
+        'size_distribution': distribution,
+        'bit_depths': bit_depths,
+        'multi_image_files': sum(1 for entry in readable if entry.header.image_count > 1),
+        'files_with_thumbnails': sum(1 for entry in readable if entry.header.thumbnail_count),
+        'grid_images': sum(1 for entry in readable if entry.header.is_grid),
+        'estimate': {
+            'output_format': output_format,
+            'output_bytes': int(total_pixels * TYPICAL_BYTES_PER_PIXEL.get(output_format, 1.0)),
+            'workers': effective_workers,
+            'megapixels_per_second_per_worker': round(megapixels_per_second, 3),
+            'runtime_seconds': round(seconds, 1),
+        },
+    }
+
+def _format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1000:
+            return f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} TB"
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m {seconds:02d}s" if hours else f"{minutes}m {seconds:02d}s"
+
+def format_summary(summary: dict) -> str:
+    """Render summarize() output as the text report."""
+    estimate = summary['estimate']
+    lines = [
+        f"Files: {summary['files']} ({summary['readable']} readable, {len(summary['corrupt'])} corrupt)",
+        f"Input size: {_format_bytes(summary['input_bytes'])}",
+        f"Total pixels: {summary['total_megapixels']:.1f} MP "
+        f"(min {summary['megapixels']['min']:.1f}, median {summary['megapixels']['p50']:.1f}, "
+        f"p90 {summary['megapixels']['p90']:.1f}, max {summary['megapixels']['max']:.1f} MP)",
+        "Size distribution: " + ', '.join(f"{label}: {count}" for label, count in summary['size_distribution'].items()),
+        "Bit depths: " + (', '.join(f"{depth}-bit: {count}" for depth, count in sorted(summary['bit_depths'].items()))
+                          or 'n/a'),
+        f"Multi-image files: {summary['multi_image_files']}, with thumbnails: {summary['files_with_thumbnails']}, "
+        f"grid images: {summary['grid_images']}",
+        f"Estimated output: {_format_bytes(estimate['output_bytes'])} as {estimate['output_format'].upper()}",
+        f"Estimated runtime: {_format_duration(estimate['runtime_seconds'])} on {estimate['workers']} workers "
+        f"({estimate['megapixels_per_second_per_worker']:.1f} MP/s per worker)",
+    ]
+    for corrupt in summary['corrupt']:
+        lines.append(f"❌ {corrupt['file']}: {corrupt['error']}")
+    return '\n'.join(lines)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Batch Scheduler
+Runs conversion jobs on a pool of worker threads, largest jobs first.
+
+Each job gets a cost estimate from its file size and, for HEIF files, the
+image dimensions in its header. Jobs are dealt out longest-processing-time
+first onto per-worker queues, and a worker that runs dry steals from the
+busiest queue so a batch does not end with one worker grinding through a
+large image while the others sit idle.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .heif_header import HeifHeaderError, read_heif_header
+    from .metrics import percentile
+except ImportError:
+    from heif_header import HeifHeaderError, read_heif_header
+    from metrics import percentile
+
+# Rough pixels per compressed byte for HEIC files, used when the header is unreadable
+PIXELS_PER_BYTE = 5
+# Fixed per-file overhead (open, stat, write) expressed in pixels
+FILE_OVERHEAD_PIXELS = 50_000
+# Threads reading headers while planning; reads are small and wait on storage, not the CPU
+PLAN_READ_WORKERS = 16
+
+class Job:
+    """A file to convert together with its estimated cost."""
+
+    def __init__(self, path: str, cost: float, index: int):
+        self.path = path
+        self.cost = cost
+        self.index = index
+
+def estimate_cost(path: str) -> float:
+    """
+    Estimate the relative cost of converting a file, in pixel units.
+
+    Args:
+        path: Path to the input file
+
+    Returns:
+        Estimated cost; larger means slower to convert
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return FILE_OVERHEAD_PIXELS
+    try:
+        pixels = read_heif_header(path).pixels
+    except (HeifHeaderError, OSError):
+        pixels = size * PIXELS_PER_BYTE
+    return pixels + FILE_OVERHEAD_PIXELS
+
+def plan_jobs(paths: Iterable[str], workers: int = PLAN_READ_WORKERS) -> List[Job]:
+    """
+    Create jobs for paths, sorted by estimated cost, largest first.
+
+    Headers are read in parallel, as scan.scan_files() does, so planning a
+    large batch on network storage does not hold up every worker for long.
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        costs = list(pool.map(estimate_cost, paths))
+    jobs = [Job(path, cost, i) for i, (path, cost) in enumerate(zip(paths, costs))]
+    jobs.sort(key=lambda job: job.cost, reverse=True)
+    return jobs
+
+class ScheduleStats:
+    """Timing summary of a scheduled batch."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.makespan = 0.0
+        self.job_seconds: List[float] = []
+        self.worker_busy: List[float] = [0.0] * workers
+        self.steals = 0
+        # Estimated cost of the finished jobs, so throughput can be compared across image sizes
+        self.completed_cost = 0.0
+
+    @property
+    def ideal_makespan(self) -> float:
+        """Total work divided evenly over all workers."""
+        return sum(self.job_seconds) / self.workers if self.workers else 0.0
+
+    @property
+    def efficiency(self) -> float:
+        """Ideal makespan divided by the actual one (1.0 is perfect balance)."""
+        return self.ideal_makespan / self.makespan if self.makespan > 0 else 0.0
+
+    def merge(self, other: 'ScheduleStats'):
+        """Add the stats of a later batch run on the same workers, as when a worker converts several ranges."""
+        self.makespan += other.makespan
+        self.job_seconds.extend(other.job_seconds)
+        self.worker_busy = [mine + theirs for mine, theirs in zip(self.worker_busy, other.worker_busy)]
+        self.steals += other.steals
+        self.completed_cost += other.completed_cost
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.job_seconds)
+        return {
+            'workers': self.workers,
+            'makespan_seconds': round(self.makespan, 6),
+            'ideal_makespan_seconds': round(self.ideal_makespan, 6),
+            'efficiency': round(self.efficiency, 4),
+            'steals': self.steals,
+            'job_latency_seconds': {
+                'p50': round(percentile(latencies, 0.50), 6),
+                'p95': round(percentile(latencies, 0.95), 6),
+                'p99': round(percentile(latencies, 0.99), 6),
+                'max': round(latencies[-1], 6) if latencies else 0.0,
+            },
+            'worker_busy_seconds': [round(busy, 6) for busy in self.worker_busy],
+        }
+
+class WorkStealingScheduler:
+    """
+    Run jobs on worker threads with per-worker queues and work stealing.
+
+    Pillow and pillow-heif release the GIL while decoding and encoding, so
+    threads are enough to keep every core busy.
+
+    With max_workers, that many threads are started but only the first
+    `active` ones take jobs; set_active() changes the number at runtime and
+    parked workers resume when they are needed again.
+
+    Args:
+        workers: Number of worker threads taking jobs at the start
+        max_workers: Number of worker threads started (default: workers)
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_workers: Optional[int] = None):
+        self.active = max(1, workers or os.cpu_count() or 1)
+        self.workers = max(self.active, max_workers or 0)
+        self.stats = ScheduleStats(self.workers)
+        self._queues: List[Deque[Job]] = []
+        self._remaining: List[float] = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def set_active(self, count: int) -> int:
+        """
+        Set how many workers take jobs, within 1..workers.
+
+        Workers above the new count finish their current job and then park.
+
+        Returns:
+            The number of active workers after clamping
+        """
+        with self._changed:
+            self.active = max(1, min(self.workers, count))
+            self._changed.notify_all()
+            return self.active
+
+    def _distribute(self, jobs: List[Job]):
+        # Longest-processing-time first: each job goes to the least loaded queue
+        self._queues = [deque() for _ in range(self.workers)]
+        self._remaining = [0.0] * self.workers
+        for job in sorted(jobs, key=lambda job: job.cost, reverse=True):
+            target = min(range(self.workers), key=lambda i: self._remaining[i])
+            self._queues[target].append(job)
+            self._remaining[target] += job.cost
+
+    def _next_job(self, worker: int) -> Optional[Job]:
+        with self._changed:
+            # Parked workers wait until they are active again or the batch runs out
+            while worker >= self.active and any(self._queues):
+                self._changed.wait()
+            own = self._queues[worker]
+            if own:
+                job = own.popleft()
+                self._remaining[worker] -= job.cost
+                return job
+            # Steal the smallest job from the queue with the most work left
+            victim = max(range(self.workers), key=lambda i: self._remaining[i])
+            if not self._queues[victim]:
+                # Release parked workers so they can exit
+                self._changed.notify_all()
+                return None
+            if victim >= self.active:
+                # A parked worker's queue is taken over in order, largest job first
+                job = self._queues[victim].popleft()
+            else:
+                job = self._queues[victim].pop()
+                self.stats.steals += 1
+            self._remaining[victim] -= job.cost
+            return job
+
+    def _work(self, worker: int, func: Callable[[str], Any], results: 'queue.Queue'):
+        while True:
+            job = self._next_job(worker)
+            if job is None:
+                break
+            start = time.perf_counter()
+            try:
+                outcome = func(job.path)
+            except Exception as e:
+                # func is expected to capture its own errors; never lose a worker to one
+                outcome = e
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stats.job_seconds.append(elapsed)
+                self.stats.worker_busy[worker] += elapsed
+                self.stats.completed_cost += job.cost
+            results.put((job, outcome))
+        results.put(None)
+
+    def run(self, jobs: List[Job], func: Callable[[str], Any]) -> Iterator[Tuple[Job, Any]]:
+        """
+        Run func(path) for every job and yield (job, result) as jobs complete.
+
+        Results are yielded on the calling thread, so callers can print or
+        aggregate without locking. If func raises, the exception is yielded
+        as the result.
+
+        Args:
+            jobs: Jobs to run, usually from plan_jobs()
+            func: Function converting one file
+
+        Yields:
+            Tuple of (job, result) in completion order
+        """
+        self.stats = ScheduleStats(self.workers)
+        self._distribute(jobs)
+        results: 'queue.Queue' = queue.Queue()
+        threads = [
+            threading.Thread(target=self._work, args=(i, func, results), daemon=True)
+            for i in range(self.workers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        finished = 0
+        while finished < len(threads):
+            item = results.get()
+            if item is None:
+                finished += 1
+                continue
+            yield item
+
+        for thread in threads:
+            thread.join()
+        self.stats.makespan = time.perf_counter() - start
@@ -0,0 +1,43 @@
+"""
+Shared fixtures: synthetic HEIC sets and a headless Qt application.
+
+The modules live at the repository root and fall back to absolute imports
+when loaded outside the package, so the root is put on sys.path.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import synthetic
+
+# Sizes small enough to keep the suite fast while still covering odd dimensions and chroma edges
+SIZES = [(64, 48), (333, 211), (640, 480), (17, 1)]
+
+@pytest.fixture(scope='session')
+def heic_set(tmp_path_factory):
+    """Twelve fixtures over every mode and size, with mixed-case .heic/.heif/.hif extensions."""
+    directory = str(tmp_path_factory.mktemp('heic_set'))
+    return synthetic.write_set(directory, 12, SIZES, extensions=['.heic', '.HEIC', '.heif', '.hif'])
+
+@pytest.fixture(scope='session')
+def throughput_set(tmp_path_factory):
+    """Eight identical-size RGB fixtures, so every file costs about the same to convert."""
+    directory = str(tmp_path_factory.mktemp('throughput_set'))
+    return synthetic.write_set(directory, 8, [(1024, 768)], modes=('RGB',))
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep calibration and thumbnail caches out of the user's home directory."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
@@ -0,0 +1,184 @@
+"""
+Synthetic HEIC fixtures for the test suite.
+
+Images are generated from a seed, so every run works offline on the same
+pixels: a gradient background with random rectangles and ellipses, which
+gives the encoders both smooth areas and hard edges to work on.
+"""
+
+import os
+import random
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+import pillow_heif
+from PIL import Image, ImageDraw
+
+# Modes a fixture can be generated in; '10-bit' is RGB stored with 10 bits per channel
+MODES = ('RGB', 'RGBA', '10-bit')
+
+def make_image(size: Tuple[int, int], mode: str = 'RGB', seed: int = 0) -> Image.Image:
+    """Deterministic test image of the given size in 'RGB' or 'RGBA' mode."""
+    rng = random.Random(seed)
+    width, height = size
+    img = Image.linear_gradient('L').resize(size).convert('RGB')
+    img = Image.merge('RGB', (img.getchannel(0),
+                              img.getchannel(0).transpose(Image.Transpose.ROTATE_180),
+                              Image.new('L', size, rng.randrange(256))))
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(3, 12)):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        box = (x0, y0, min(width - 1, x0 + rng.randrange(1, width // 2 + 2)),
+               min(height - 1, y0 + rng.randrange(1, height // 2 + 2)))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle(box, fill=color)
+        else:
+            draw.ellipse(box, fill=color)
+    if mode == 'RGBA':
+        alpha = Image.radial_gradient('L').resize(size)
+        img.putalpha(alpha)
+    return img
+
+def write_heic(path: str, size: Tuple[int, int], mode: str = 'RGB', seed: int = 0,
+               quality: int = 80, thumbnails: Sequence[int] = ()) -> str:
+    """Write a synthetic HEIC file, with embedded thumbnails of the given sizes, and return its path."""
+    if mode == '10-bit':
+        # Little-endian 16-bit samples with the 8-bit value in the high byte
+        red, green, blue = (channel.tobytes() for channel in make_image(size, 'RGB', seed).split())
+        pixels = bytearray(6 * size[0] * size[1])
+        pixels[1::6], pixels[3::6], pixels[5::6] = red, green, blue
+        heif_file = pillow_heif.from_bytes('RGB;16', size, bytes(pixels))
+        heif_file.save(path, quality=quality, thumbnails=list(thumbnails))
+    else:
+        heif_file = pillow_heif.from_pillow(make_image(size, mode, seed))
+        heif_file.save(path, quality=quality, thumbnails=list(thumbnails))
+    return path
+
+def write_set(directory: str, count: int, sizes: List[Tuple[int, int]], modes=MODES,
+              extensions: Optional[List[str]] = None, seed: int = 0) -> List[str]:
+    """
+    Write count fixtures cycling through sizes, modes and extensions.
+
+    Returns:
+        The paths written, in order
+    """
+    os.makedirs(directory, exist_ok=True)
+    extensions = extensions or ['.heic']
+    paths = []
+    for index in range(count):
+        size = sizes[index % len(sizes)]
+        mode = modes[index % len(modes)]
+        extension = extensions[index % len(extensions)]
+        name = f"img{index:03d}_{size[0]}x{size[1]}_{mode.replace('-', '')}{extension}"
+        paths.append(write_heic(os.path.join(directory, name), size, mode, seed + index))
+    return paths
+
+def write_grid_heic(path: str, size: Tuple[int, int], tile_size: int = 256, seed: int = 0,
+                    rotation: int = 0) -> str:
+    """
+    Write a synthetic HEIC stored as a grid of tiles, like phone photos.
+
+    rotation adds an 'irot' property of that many counter-clockwise quarter
+    turns to the grid, as cameras do for portrait shots.
+    """
+    heif_file = pillow_heif.from_pillow(make_image(size, 'RGB', seed))
+    heif_file.save(path, quality=80, tile_size=tile_size)
+    if rotation:
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(_add_rotation(data, rotation))
+    return path
+
+def _box_at(data, offset):
+    size, box_type = struct.unpack_from('>I4s', data, offset)
+    return box_type, offset + 8, offset + size
+
+def _children(data, start, end):
+    while start < end:
+        box_type, payload, box_end = _box_at(data, start)
+        yield box_type, start, payload, box_end
+        start = box_end
+
+def _add_rotation(data: bytes, rotation: int) -> bytes:
+    """Add an 'irot' property to the primary item of a HEIF file whose 'meta' box precedes its data."""
+    data = bytearray(data)
+    meta = next((start, payload, end) for box_type, start, payload, end in _children(data, 0, len(data))
+                if box_type == b'meta')
+    boxes = {box_type: (start, payload, end) for box_type, start, payload, end
+             in _children(data, meta[1] + 4, meta[2])}
+    primary_item = struct.unpack_from('>H', data, boxes[b'pitm'][1] + 4)[0]
+    iprp = boxes[b'iprp']
+    iprp_boxes = {box_type: (start, payload, end) for box_type, start, payload, end
+                  in _children(data, iprp[1], iprp[2])}
+    ipco, ipma = iprp_boxes[b'ipco'], iprp_boxes[b'ipma']
+    property_count = len(list(_children(data, ipco[1], ipco[2])))
+
+    # The new association: the ipma entry of the primary item gets one more property
+    version, flags = data[ipma[1]], int.from_bytes(data[ipma[1] + 1:ipma[1] + 4], 'big')
+    offset = ipma[1] + 8
+    insert_at = None
+    for _ in range(struct.unpack_from('>I', data, ipma[1] + 4)[0]):
+        item_id = struct.unpack_from('>H' if version < 1 else '>I', data, offset)[0]
+        offset += 2 if version < 1 else 4
+        count_at = offset
+        count = data[offset]
+        offset += 1 + count * (2 if flags & 1 else 1)
+        if item_id == primary_item:
+            insert_at = offset
+            data[count_at] = count + 1
+            break
+    association = struct.pack('>H', 0x8000 | (property_count + 1)) if flags & 1 else bytes([0x80 | (property_count + 1)])
+    irot = struct.pack('>I4sB', 9, b'irot', rotation & 3)
+
+    # Insert from the back so earlier offsets stay valid, growing each enclosing box as we go
+    data[insert_at:insert_at] = association
+    _grow(data, ipma[0], len(association))
+    data[ipco[2]:ipco[2]] = irot
+    _grow(data, ipco[0], len(irot))
+    growth = len(association) + len(irot)
+    _grow(data, iprp[0], growth)
+    _grow(data, meta[0], growth)
+
+    # Item data after the meta box moved by the growth; iloc comes before ipco so its position is unchanged
+    iloc = boxes[b'iloc']
+    _shift_iloc(data, iloc[1], growth)
+    return bytes(data)
+
+def _grow(data: bytearray, box_start: int, delta: int):
+    struct.pack_into('>I', data, box_start, struct.unpack_from('>I', data, box_start)[0] + delta)
+
+def _shift_iloc(data: bytearray, start: int, delta: int):
+    """Add delta to every file offset in an 'iloc' box."""
+    version = data[start]
+    offset = start + 4
+    offset_size, length_size = data[offset] >> 4, data[offset] & 15
+    base_offset_size, index_size = data[offset + 1] >> 4, data[offset + 1] & 15
+    offset += 2
+    id_size = 2 if version < 2 else 4
+    item_count = int.from_bytes(data[offset:offset + id_size], 'big')
+    offset += id_size
+    for _ in range(item_count):
+        offset += id_size
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = int.from_bytes(data[offset:offset + 2], 'big') & 15
+            offset += 2
+        offset += 2
+        shift = construction_method == 0
+        if base_offset_size:
+            if shift:
+                value = int.from_bytes(data[offset:offset + base_offset_size], 'big') + delta
+                data[offset:offset + base_offset_size] = value.to_bytes(base_offset_size, 'big')
+                shift = False
+            offset += base_offset_size
+        extent_count = int.from_bytes(data[offset:offset + 2], 'big')
+        offset += 2
+        for _ in range(extent_count):
+            if version in (1, 2):
+                offset += index_size
+            if shift:
+                value = int.from_bytes(data[offset:offset + offset_size], 'big') + delta
+                data[offset:offset + offset_size] = value.to_bytes(offset_size, 'big')
+            offset += offset_size + length_size
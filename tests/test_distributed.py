@@ -0,0 +1,129 @@
+"""
+Lease coordination tests: ranges of a plan must go to one worker at a time.
+
+Most workers are LeaseWorker objects in one process sharing a lease
+directory; interleavings that need precise timing between processes are
+forced by running one worker's claim from inside another's file system
+calls. The end-to-end tests start cli.py processes standing in for nodes.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+import distributed
+from distributed import LeaseWorker, create_plan
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cli.py')
+
+def make_plan(tmp_path, count=6, range_size=2):
+    lease_dir = str(tmp_path / 'leases')
+    create_plan(lease_dir, [f"/photos/img{index}.heic" for index in range(count)], range_size)
+    return lease_dir
+
+def backdate_leases(lease_dir):
+    for name in os.listdir(lease_dir):
+        if '.lease' in name:
+            os.utime(os.path.join(lease_dir, name), (0, 0))
+
+def test_each_range_is_claimed_once(tmp_path):
+    lease_dir = make_plan(tmp_path)
+    workers = [LeaseWorker(lease_dir, f"w{index}") for index in range(4)]
+    claimed = [worker.claim() for worker in workers]
+    assert sorted(claim[0] for claim in claimed if claim) == [0, 1, 2]
+    assert claimed.count(None) == 1
+    assert sorted(path for claim in claimed if claim for path in claim[1]) == \
+        sorted(f"/photos/img{index}.heic" for index in range(6))
+
+def test_plan_keeps_file_lists_out_of_the_plan_file(tmp_path):
+    lease_dir = make_plan(tmp_path, count=5)
+    with open(os.path.join(lease_dir, distributed.PLAN_FILE)) as f:
+        assert 'img' not in f.read()
+    assert LeaseWorker(lease_dir).range_count == 3
+
+def test_stale_lease_is_taken_over_by_one_worker(tmp_path, monkeypatch):
+    lease_dir = make_plan(tmp_path, count=2)
+    crashed, a, b = (LeaseWorker(lease_dir, name, lease_timeout=60) for name in ('crashed', 'a', 'b'))
+    assert crashed.claim()[0] == 0
+    backdate_leases(lease_dir)
+
+    # b sees the stale lease, then a takes it over before b acts on what it saw
+    getmtime = os.path.getmtime
+    taken_over = []
+
+    def interleaved(path):
+        mtime = getmtime(path)
+        monkeypatch.setattr(distributed.os.path, 'getmtime', getmtime)
+        taken_over.append(a.claim())
+        return mtime
+
+    monkeypatch.setattr(distributed.os.path, 'getmtime', interleaved)
+    assert b.claim() is None
+    assert taken_over[0][0] == 0
+
+def test_released_and_completed_ranges(tmp_path):
+    lease_dir = make_plan(tmp_path, count=4)
+    a, b = LeaseWorker(lease_dir, 'a'), LeaseWorker(lease_dir, 'b')
+    a.release(a.claim()[0])
+    claimed = [b.claim()[0], b.claim()[0]]
+    assert sorted(claimed) == [0, 1]
+    assert a.claim() is None
+    for index in claimed:
+        b.complete(index)
+    assert a.pending() == 0
+    assert a.claim() is None and b.claim() is None
+
+def start_cli(*args):
+    return subprocess.Popen([sys.executable, CLI, '--format', 'png', *args],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+def finish(process):
+    output, _ = process.communicate(timeout=300)
+    return process.returncode, output
+
+def manifest_sources(paths):
+    """Count how often each source appears across manifests."""
+    sources = Counter()
+    for path in paths:
+        with open(path) as f:
+            sources.update(json.loads(line)['source'] for line in f if line.strip())
+    return sources
+
+def test_worker_processes_convert_every_file_once(heic_set, tmp_path):
+    lease_dir, output_dir = str(tmp_path / 'leases'), str(tmp_path / 'out')
+    input_dir = os.path.dirname(heic_set[0])
+    assert finish(start_cli('--lease-dir', lease_dir, '--range-size', '2', input_dir))[0] == 0
+
+    # Planning again over an existing plan is refused without a traceback
+    code, output = finish(start_cli('--lease-dir', lease_dir, input_dir))
+    assert code == 1 and output.startswith('Error:') and 'Traceback' not in output
+
+    workers = [start_cli('--lease-dir', lease_dir, '--output', output_dir, '--worker-id', f"node{index}")
+               for index in range(3)]
+    for process in workers:
+        code, output = finish(process)
+        assert code == 0, output
+
+    manifests = distributed.find_manifests([lease_dir])
+    assert len(manifests) == 3
+    expected = {os.path.abspath(path) for path in heic_set}
+    assert manifest_sources(manifests) == Counter(expected)
+    summary = distributed.merge_manifests([lease_dir], str(tmp_path / 'all.jsonl'))
+    assert summary['files'] == summary['succeeded'] == len(heic_set)
+    assert len(os.listdir(output_dir)) == len(heic_set)
+
+def test_shards_split_the_inputs(heic_set, tmp_path):
+    input_dir = os.path.dirname(heic_set[0])
+    count = 3
+    manifests = [str(tmp_path / f"shard{index}.jsonl") for index in range(count)]
+    shards = [start_cli('--shard', f"{index}/{count}", '--manifest', manifests[index],
+                        '--output', str(tmp_path / 'out'), input_dir) for index in range(count)]
+    for process in shards:
+        code, output = finish(process)
+        assert code == 0, output
+
+    per_shard = [set(manifest_sources([path])) for path in manifests if os.path.exists(path)]
+    assert sum(len(sources) for sources in per_shard) == len(heic_set)
+    assert set().union(*per_shard) == {os.path.abspath(path) for path in heic_set}
@@ -0,0 +1,148 @@
+"""
+Regression tests: every entry point must produce the same files.
+
+cli, heic_converter and both GUI workers share core.convert but each finds
+its inputs and output paths its own way; these tests run all of them on the
+same synthetic fixtures and compare the output bytes.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import pytest
+from PIL import Image
+
+import cli
+import core
+import formats
+import heic_converter
+import heif_tiles
+
+import synthetic
+
+ENCODABLE = [fmt.name for fmt in formats.output_formats() if fmt.can_encode and fmt.name in ('jpg', 'png', 'webp')]
+
+def read_outputs(directory, extension):
+    """Map file names to contents for the outputs of one format in a directory."""
+    return {name: open(os.path.join(directory, name), 'rb').read()
+            for name in sorted(os.listdir(directory)) if name.endswith(extension)}
+
+def copy_inputs(paths, directory):
+    os.makedirs(directory, exist_ok=True)
+    copies = []
+    for path in paths:
+        copies.append(shutil.copy(path, directory))
+    return copies
+
+def run_cli(monkeypatch, inputs, output_dir, output_format, *options):
+    monkeypatch.setattr(sys, 'argv', ['cli', '--format', output_format, '--output', str(output_dir),
+                                      '--workers', '2', *options, *inputs])
+    cli.main()
+
+def run_heic_converter(monkeypatch, input_dir, output_dir, output_format):
+    monkeypatch.setattr(sys, 'argv', ['heic_converter', input_dir, '--format', output_format,
+                                      '--output', str(output_dir)])
+    heic_converter.main()
+
+def run_gui_worker(module_name, files, output_format):
+    """Run a GUI FileConversionWorker thread to completion without a window."""
+    module = __import__(module_name)
+    worker = module.FileConversionWorker(files, output_format.upper(), True)
+    worker.start()
+    assert worker.wait(120000), "GUI worker did not finish"
+    return worker
+
+@pytest.mark.parametrize('output_format', ENCODABLE)
+def test_entry_points_produce_identical_outputs(heic_set, tmp_path, monkeypatch, qapp, output_format):
+    extension = formats.get_format(output_format).extensions[0]
+    input_dir = os.path.dirname(heic_set[0])
+
+    run_cli(monkeypatch, [input_dir], tmp_path / 'cli', output_format)
+    run_heic_converter(monkeypatch, input_dir, tmp_path / 'heic_converter', output_format)
+    results = {
+        'cli': read_outputs(tmp_path / 'cli', extension),
+        'heic_converter': read_outputs(tmp_path / 'heic_converter', extension),
+    }
+    for module_name in ('gui', 'heic_converter_gui'):
+        files = copy_inputs(heic_set, str(tmp_path / module_name))
+        worker = run_gui_worker(module_name, files, output_format)
+        assert worker.completed == len(heic_set)
+        results[module_name] = read_outputs(tmp_path / module_name / f"converted_{output_format}", extension)
+
+    expected = {os.path.splitext(os.path.basename(path))[0] + extension for path in heic_set}
+    assert set(results['cli']) == expected
+    for name, outputs in results.items():
+        assert outputs == results['cli'], f"{name} differs from cli"
+
+def test_directory_discovery_covers_every_heif_extension(heic_set, tmp_path):
+    directory = os.path.dirname(heic_set[0])
+    (tmp_path / 'notes.txt').write_text('not an image')
+    assert sorted(cli.find_heic_files(directory)) == sorted(heic_set)
+    assert sorted(cli.collect_inputs(heic_set)) == sorted(heic_set)
+
+@pytest.mark.parametrize('options', [
+    [],
+    ['--writer-threads', '0', '--prefetch', '0'],
+    ['--durability', 'batch', '--fsync-batch', '3'],
+    ['--prefetch-mode', 'memory', '--prefetch-bytes', '100KB'],
+    ['--workers', '1'],
+], ids=['default', 'synchronous', 'batch-fsync', 'memory-prefetch', 'one-worker'])
+def test_cli_pipeline_options_do_not_change_outputs(heic_set, tmp_path, monkeypatch, options):
+    input_dir = os.path.dirname(heic_set[0])
+    run_cli(monkeypatch, [input_dir], tmp_path / 'reference', 'jpg', '--writer-threads', '0', '--prefetch', '0',
+            '--workers', '1')
+    run_cli(monkeypatch, [input_dir], tmp_path / 'variant', 'jpg', *options)
+    reference = read_outputs(tmp_path / 'reference', '.jpg')
+    assert len(reference) == len(heic_set)
+    assert read_outputs(tmp_path / 'variant', '.jpg') == reference
+
+def test_png_output_is_lossless(heic_set, tmp_path):
+    for path in heic_set:
+        result = core.convert(path, 'png', str(tmp_path))
+        assert result.success, result.message
+        with Image.open(path) as source, Image.open(result.output_path) as output:
+            assert output.size == source.size
+            assert output.mode == source.mode
+            assert output.tobytes() == source.tobytes()
+
+def test_jpg_output_is_close_to_source(heic_set, tmp_path):
+    for path in heic_set:
+        result = core.convert(path, 'jpg', str(tmp_path))
+        assert result.success, result.message
+        with Image.open(path) as source, Image.open(result.output_path) as output:
+            source = core.prepare_image(source, 'jpg')
+            assert output.size == source.size
+            if min(source.size) < 16:
+                # Too small for a meaningful error: a single 8x8 block with subsampled chroma
+                continue
+            difference = sum(abs(a - b) for a, b in zip(source.tobytes(), output.tobytes()))
+            # Mean absolute error per channel value, mostly from chroma subsampling on hard edges
+            assert difference / len(source.tobytes()) < 6
+
+@pytest.mark.parametrize('output_format', ENCODABLE)
+def test_grid_images_convert_like_a_whole_image_decode(tmp_path, monkeypatch, output_format):
+    """Tile-by-tile decoding must not change the output pixels of phone-style grid images."""
+    path = synthetic.write_grid_heic(str(tmp_path / 'grid.heic'), (1100, 700), seed=4)
+    tiled = core.convert(path, output_format, str(tmp_path / 'tiled'))
+    monkeypatch.setattr(heif_tiles, 'open_grid', lambda f: None)
+    whole = core.convert(path, output_format, str(tmp_path / 'whole'))
+    assert tiled.success and whole.success, (tiled.message, whole.message)
+    with Image.open(tiled.output_path) as a, Image.open(whole.output_path) as b:
+        assert a.size == b.size == (1100, 700)
+        assert a.tobytes() == b.tobytes()
+
+def test_inputs_already_in_the_output_format_are_copied(heic_set, tmp_path, monkeypatch, capsys, qapp):
+    jpgs = [core.convert(path, 'jpg', str(tmp_path / 'jpg')).output_path for path in heic_set[:3]]
+
+    run_cli(monkeypatch, [*jpgs, heic_set[3]], tmp_path / 'cli', 'jpg', '--report', 'json')
+    report = json.loads(capsys.readouterr().out)
+    assert report['files']['succeeded'] == 4
+    assert report['files']['passthrough'] == 3
+    for path in jpgs:
+        assert open(tmp_path / 'cli' / os.path.basename(path), 'rb').read() == open(path, 'rb').read()
+
+    for module_name in ('gui', 'heic_converter_gui'):
+        worker = run_gui_worker(module_name, copy_inputs(jpgs, str(tmp_path / module_name)), 'jpg')
+        assert (worker.completed, worker.copied) == (3, 3)
@@ -0,0 +1,72 @@
+"""
+Header reader tests on corrupt files: every malformed box structure must end
+in HeifHeaderError, promptly, so one bad file cannot stall or crash a batch.
+
+Files are built box by box, so each test corrupts exactly one field.
+"""
+
+import io
+import struct
+
+import pytest
+
+import scan
+from heif_header import HeifHeaderError, read_heif_meta
+from scheduler import plan_jobs
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def heif_file(iloc_payload):
+    """A HEIF file with a primary item 1 and the given 'iloc' payload."""
+    ftyp = box(b'ftyp', b'heic' + bytes(4) + b'mif1heic')
+    pitm = box(b'pitm', bytes(4) + struct.pack('>H', 1))
+    return ftyp + box(b'meta', bytes(4) + pitm + box(b'iloc', iloc_payload))
+
+def iloc(version=0, item_count=1, extent_count=1, extents=None):
+    """An 'iloc' payload with 4-byte offsets and lengths, for item 1 stored at (100, 50)."""
+    id_format = '>H' if version < 2 else '>I'
+    payload = bytes([version, 0, 0, 0, 0x44, 0x00]) + struct.pack(id_format, item_count)
+    payload += struct.pack(id_format, 1)
+    if version in (1, 2):
+        payload += struct.pack('>H', 0)
+    payload += struct.pack('>HH', 0, extent_count)
+    return payload + (struct.pack('>II', 100, 50) if extents is None else extents)
+
+@pytest.mark.parametrize('version', [0, 1, 2])
+def test_iloc_locations_are_read(version):
+    meta = read_heif_meta(io.BytesIO(heif_file(iloc(version))))
+    assert meta.locations == {1: (0, [(100, 50)])}
+
+@pytest.mark.parametrize('extents', [b'', struct.pack('>I', 100), struct.pack('>IH', 100, 0)])
+def test_truncated_iloc_is_rejected(extents):
+    with pytest.raises(HeifHeaderError):
+        read_heif_meta(io.BytesIO(heif_file(iloc(extents=extents))))
+
+@pytest.mark.parametrize('version, item_count, extent_count', [
+    (0, 0xFFFF, 1), (0, 1, 0xFFFF), (1, 0xFFFF, 0xFFFF), (2, 0xFFFFFFFF, 1), (2, 1, 0xFFFF),
+])
+def test_corrupt_iloc_counts_are_rejected(version, item_count, extent_count):
+    with pytest.raises(HeifHeaderError):
+        read_heif_meta(io.BytesIO(heif_file(iloc(version, item_count, extent_count))))
+
+def test_scan_reports_a_corrupt_iloc(tmp_path):
+    path = tmp_path / 'corrupt.heic'
+    path.write_bytes(heif_file(iloc(2, 0xFFFFFFFF, 0xFFFF)))
+    entry = scan.scan_file(str(path))
+    assert entry.error is not None
+
+@pytest.mark.parametrize('data', [
+    b'\x00\x00\x00\x01ftyp\x00\x00',     # 64-bit size cut short
+    b'\x00\x00\x00\x04ftypheic',         # size smaller than the box header
+    box(b'ftyp', b'heic' + bytes(4))[:-2],  # payload cut short
+])
+def test_truncated_box_headers_are_rejected(data):
+    with pytest.raises(HeifHeaderError):
+        read_heif_meta(io.BytesIO(data))
+
+def test_truncated_file_is_planned_and_scanned(tmp_path):
+    path = tmp_path / 'truncated.heic'
+    path.write_bytes(b'\x00\x00\x00\x01ftyp\x00\x00')
+    assert [job.path for job in plan_jobs([str(path)])] == [str(path)]
+    assert scan.scan_file(str(path)).error is not None
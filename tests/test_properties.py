@@ -0,0 +1,272 @@
+"""
+Property-based tests over randomly generated images and inputs.
+
+Each test draws its parameters from a seed. With hypothesis installed the
+seeds are drawn (and failures shrunk) by hypothesis; without it every test
+runs over a fixed range of seeds, so the suite needs nothing beyond pytest.
+"""
+
+import io
+import random
+import threading
+
+import pytest
+from PIL import Image
+
+import adaptive
+import core
+import formats
+import heif_tiles
+import scan
+from adaptive import AdaptiveController, Sample
+from jobqueue import JobQueue, PRIORITY_NORMAL, PRIORITY_USER
+from scheduler import Job, ScheduleStats, WorkStealingScheduler, plan_jobs
+
+import synthetic
+
+try:
+    from hypothesis import HealthCheck, given, settings, strategies
+except ImportError:
+    given = None
+
+LOSSLESS_FORMATS = [name for name in ('png',) if formats.get_format(name).can_encode]
+LOSSY_FORMATS = [name for name in ('jpg', 'webp') if formats.get_format(name).can_encode]
+# Pillow transposes matching 'irot' quarter turns, indexed by the number of turns
+ROTATIONS = [None, Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_180, Image.Transpose.ROTATE_270]
+
+def seeded(examples):
+    """Run a test once per seed: drawn by hypothesis when available, else 0..examples-1."""
+    def decorate(test):
+        if given is not None:
+            return settings(max_examples=examples, deadline=None,
+                            suppress_health_check=[HealthCheck.function_scoped_fixture])(
+                given(seed=strategies.integers(0, 2 ** 31 - 1))(test))
+        return pytest.mark.parametrize('seed', range(examples))(test)
+    return decorate
+
+def random_fixture(rng, directory, max_side=300):
+    size = (rng.randint(1, max_side), rng.randint(1, max_side))
+    mode = rng.choice(synthetic.MODES)
+    path = synthetic.write_heic(str(directory / f"fixture_{rng.randrange(10 ** 9)}.heic"), size, mode,
+                                rng.randrange(10 ** 6))
+    return path, size, mode
+
+@seeded(12)
+def test_convert_preserves_size_and_format(tmp_path, seed):
+    rng = random.Random(seed)
+    path, size, mode = random_fixture(rng, tmp_path)
+    output_format = rng.choice(LOSSLESS_FORMATS + LOSSY_FORMATS)
+
+    result = core.convert(path, output_format, str(tmp_path / 'out'))
+
+    assert result.success, result.message
+    assert result.bytes_out > 0
+    assert formats.detect_format(result.output_path).name == output_format
+    with Image.open(result.output_path) as output:
+        assert output.size == size
+        output_type = formats.get_format(output_format)
+        assert ('A' in output.mode) == (mode == 'RGBA' and output_type.supports_alpha)
+        if output_format in LOSSLESS_FORMATS:
+            with Image.open(path) as source:
+                assert output.tobytes() == source.tobytes()
+
+@seeded(8)
+def test_target_size_is_respected(tmp_path, seed):
+    rng = random.Random(seed)
+    path, _, _ = random_fixture(rng, tmp_path, max_side=600)
+    output_format = rng.choice(LOSSY_FORMATS)
+    target = rng.randint(2000, 60000)
+
+    result = core.convert(path, output_format, str(tmp_path / 'out'), target_size=target)
+
+    if result.success:
+        assert result.bytes_out <= target
+        assert core.MIN_QUALITY <= result.quality <= core.DEFAULT_QUALITY
+    else:
+        # Only allowed when even the lowest quality does not fit
+        assert result.error_class == 'TargetSizeError', result.message
+
+@seeded(10)
+def test_header_scan_matches_the_image(tmp_path, seed):
+    rng = random.Random(seed)
+    path, size, mode = random_fixture(rng, tmp_path)
+
+    entry = scan.scan_file(path)
+
+    assert entry.error is None
+    assert (entry.header.width, entry.header.height) == size
+    assert entry.header.bit_depth == (10 if mode == '10-bit' else 8)
+    with open(path, 'rb') as f:
+        assert formats.detect_header(f.read(formats.HEADER_SIZE)).name == 'heic'
+
+@seeded(50)
+def test_parse_size_units(seed):
+    rng = random.Random(seed)
+    number = rng.randint(1, 10 ** 6)
+    unit, factor = rng.choice([('', 1), ('B', 1), ('KB', 1000), ('kib', 1024), ('MB', 1000 ** 2),
+                               ('MiB', 1024 ** 2), ('gb', 1000 ** 3)])
+    text = f"{number}{' ' * rng.randint(0, 1)}{unit}"
+    assert core.parse_size(text) == number * factor
+    with pytest.raises(ValueError):
+        core.parse_size(f"{number}{unit}x")
+
+@seeded(50)
+def test_job_queue_matches_a_model(seed):
+    """Files come out highest priority first, in order of (re)insertion within a priority."""
+    rng = random.Random(seed)
+    queue = JobQueue()
+    model = {}
+    counter = 0
+    for _ in range(rng.randint(1, 60)):
+        action = rng.random()
+        path = f"file{rng.randrange(20)}"
+        if action < 0.6:
+            priority = rng.choice([PRIORITY_NORMAL, PRIORITY_USER, PRIORITY_USER + 5])
+            assert queue.put(path, priority)
+            if path not in model or model[path][0] < priority:
+                counter += 1
+                model[path] = (priority, counter)
+        elif action < 0.8:
+            assert queue.prioritize(path) == (path in model)
+            if path in model and model[path][0] < PRIORITY_USER:
+                counter += 1
+                model[path] = (PRIORITY_USER, counter)
+        else:
+            expected = min(model, key=lambda p: (-model[p][0], model[p][1])) if model else None
+            got = queue.get()
+            assert got == expected
+            if got is None:
+                # The run is over and refuses new files
+                assert not queue.put(path)
+                return
+            del model[got]
+        assert len(queue) == len(model)
+    order = sorted(model, key=lambda p: (-model[p][0], model[p][1]))
+    assert queue.cancel() == order
+    assert queue.get() is None
+
+class InterleavedLock:
+    """A lock that runs a function once, right after it is next released."""
+
+    def __init__(self, between):
+        self._lock = threading.Lock()
+        self._between = between
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+        between, self._between = self._between, None
+        if between:
+            between()
+
+def test_prioritize_does_not_requeue_a_file_just_taken():
+    """A worker taking a double-clicked file as it is prioritized must not get it twice."""
+    queue = JobQueue()
+    queue.put('a')
+    taken = []
+    queue._lock = InterleavedLock(lambda: taken.append(queue.get()))
+    assert queue.prioritize('a')
+    assert taken == ['a']
+    assert len(queue) == 0 and queue.get() is None
+
+@seeded(10)
+def test_plan_jobs_is_a_largest_first_permutation(tmp_path, seed):
+    rng = random.Random(seed)
+    paths = []
+    for index in range(rng.randint(1, 12)):
+        path = tmp_path / f"file{index}.heic"
+        path.write_bytes(b'\0' * rng.randint(1, 5000))
+        paths.append(str(path))
+
+    jobs = plan_jobs(paths)
+
+    assert sorted(job.path for job in jobs) == sorted(paths)
+    costs = [job.cost for job in jobs]
+    assert costs == sorted(costs, reverse=True)
+
+@seeded(10)
+def test_schedule_stats_cover_every_run(seed):
+    """A worker converting several leased ranges reports all of them, not just the last."""
+    rng = random.Random(seed)
+    scheduler = WorkStealingScheduler(rng.randint(1, 4))
+    schedule = ScheduleStats(scheduler.workers)
+    sizes = [rng.randint(0, 20) for _ in range(rng.randint(1, 5))]
+    for size in sizes:
+        jobs = [Job(f"file{index}", rng.random(), index) for index in range(size)]
+        assert len(list(scheduler.run(jobs, lambda path: path))) == size
+        schedule.merge(scheduler.stats)
+    assert len(schedule.job_seconds) == sum(sizes)
+    assert sum(schedule.worker_busy) == pytest.approx(sum(schedule.job_seconds))
+    assert schedule.makespan >= schedule.ideal_makespan
+
+@seeded(20)
+def test_adaptive_worker_count_is_time_weighted(monkeypatch, seed):
+    """Utilisation is measured against the workers that were active, not the most that could be."""
+    rng = random.Random(seed)
+    clock = [1000.0]
+    monkeypatch.setattr(adaptive.time, 'perf_counter', lambda: clock[0])
+    scheduler = WorkStealingScheduler(1, rng.randint(1, 8))
+    controller = AdaptiveController(scheduler)
+    controller._started = controller._changed_at = clock[0]
+    sample = Sample(1.0, 1, 1.0, 0.5, 0, 0.0, 0.0)
+    worker_seconds = 0.0
+    for _ in range(rng.randint(0, 10)):
+        seconds = rng.uniform(0.1, 5)
+        worker_seconds += seconds * scheduler.active
+        clock[0] += seconds
+        controller._set_workers(rng.randint(1, scheduler.workers), 'test', sample)
+    seconds = rng.uniform(0.1, 5)
+    worker_seconds += seconds * scheduler.active
+    clock[0] += seconds
+    assert controller.average_workers() == pytest.approx(worker_seconds / (clock[0] - 1000.0))
+
+@seeded(10)
+def test_quality_search_finds_the_highest_fitting_quality(seed):
+    rng = random.Random(seed)
+    output = formats.get_format(rng.choice(LOSSY_FORMATS))
+    img = synthetic.make_image((rng.randint(32, 400), rng.randint(32, 400)), 'RGB', seed)
+    sizes = {}
+    for quality in range(core.MIN_QUALITY, core.DEFAULT_QUALITY + 1):
+        buffer = io.BytesIO()
+        output.save(img, buffer, quality)
+        sizes[quality] = buffer.tell()
+    target = rng.randint(min(sizes.values()), max(sizes.values()))
+
+    quality, buffer = core.QualitySearch().encode(img, target, fmt=output)
+
+    assert buffer.tell() <= target
+    assert sizes[quality] <= target
+    # Output size is not strictly monotonic in quality, so only the chosen one must fit
+    assert quality >= max(q for q, size in sizes.items() if size <= target) - 5
+
+@seeded(8)
+def test_grid_tiles_decode_like_the_whole_image(tmp_path, seed):
+    rng = random.Random(seed)
+    size = (rng.randint(1, 700), rng.randint(1, 700))
+    tile_size = rng.choice([64, 128, 256])
+    rotation = rng.randrange(4)
+    plain = synthetic.write_grid_heic(str(tmp_path / 'plain.heic'), size, tile_size, seed)
+    rotated = synthetic.write_grid_heic(str(tmp_path / 'rotated.heic'), size, tile_size, seed, rotation)
+
+    with open(rotated, 'rb') as f, Image.open(plain) as whole:
+        grid = heif_tiles.open_grid(f)
+        assert grid is not None
+        assert grid.rotation == rotation
+        # libheif rotates odd-sized grids before cropping their padded chroma, so compare against the unrotated file
+        expected = whole.transpose(ROTATIONS[rotation]) if rotation else whole.copy()
+        assert grid.size == expected.size
+        assert grid.assemble().tobytes() == expected.tobytes()
+
+        buffer = io.BytesIO()
+        grid.save_png(buffer)
+        buffer.seek(0)
+        with Image.open(buffer) as png:
+            assert png.tobytes() == expected.tobytes()
+
+def test_grid_decoding_skips_other_images(tmp_path):
+    for mode in synthetic.MODES:
+        path = synthetic.write_heic(str(tmp_path / f"{mode}.heic"), (300, 200), mode)
+        with open(path, 'rb') as f:
+            assert heif_tiles.open_grid(f) is None
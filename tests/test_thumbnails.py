@@ -0,0 +1,145 @@
+"""
+Thumbnail tests: embedded thumbnails instead of full decodes, the memory and
+disk LRU caches, and the loader dropping requests that went out of view.
+
+Thumbnail generation is counted by wrapping make_thumbnail, so cache hits
+and misses are observed without timing anything.
+"""
+
+import os
+import threading
+import time
+
+import pillow_heif
+import pytest
+
+import thumbnails
+from thumbnails import ThumbnailCache, ThumbnailLoader
+
+import synthetic
+
+@pytest.fixture
+def generated(monkeypatch):
+    """Paths thumbnails were generated for, in order."""
+    paths = []
+    make_thumbnail = thumbnails.make_thumbnail
+
+    def counting(path, size=thumbnails.THUMBNAIL_SIZE):
+        paths.append(path)
+        return make_thumbnail(path, size)
+
+    monkeypatch.setattr(thumbnails, 'make_thumbnail', counting)
+    return paths
+
+def write_images(directory, count, size=(40, 30)):
+    paths = []
+    for index in range(count):
+        path = str(directory / f"img{index}.png")
+        synthetic.make_image(size, 'RGB', index).save(path)
+        paths.append(path)
+    return paths
+
+def test_heif_thumbnails_never_decode_the_full_image(tmp_path, monkeypatch):
+    decoded = []
+
+    def recording(to_pillow):
+        def decode(self):
+            decoded.append(self.size)
+            return to_pillow(self)
+        return decode
+
+    # Primary images and thumbnails each have their own to_pillow()
+    for cls in (pillow_heif.HeifImage, pillow_heif.heif.HeifThumbnail):
+        monkeypatch.setattr(cls, 'to_pillow', recording(cls.to_pillow))
+    embedded = synthetic.write_heic(str(tmp_path / 'embedded.heic'), (640, 480), thumbnails=[64])
+    bare = synthetic.write_heic(str(tmp_path / 'bare.heic'), (640, 480))
+
+    img = thumbnails.make_thumbnail(embedded)
+    assert max(img.size) <= thumbnails.THUMBNAIL_SIZE
+    assert img.tobytes() != thumbnails.placeholder('HEIC').tobytes()
+    assert thumbnails.make_thumbnail(bare).tobytes() == thumbnails.placeholder('HEIC').tobytes()
+    assert decoded and max(max(size) for size in decoded) <= 64
+
+def test_memory_cache_evicts_the_least_recently_used(tmp_path, generated):
+    a, b, c = write_images(tmp_path, 3)
+    cache = ThumbnailCache(memory_items=2)
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)
+    cache.get(c)
+    assert generated == [a, b, c]
+    cache.get(a)
+    cache.get(b)
+    assert generated == [a, b, c, b]
+
+def test_disk_cache_stays_below_its_limit(tmp_path, generated):
+    paths = write_images(tmp_path, 8)
+    cache_dir = str(tmp_path / 'cache')
+    one = len(ThumbnailCache().get(paths[0]))
+    cache = ThumbnailCache(cache_dir, disk_bytes=int(one * 3.5))
+    for path in paths:
+        cache.get(path)
+        # Eviction goes by modification time, so keep writes apart on coarse file system clocks
+        time.sleep(0.02)
+    entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith('.jpg')]
+    assert 0 < len(entries) < len(paths)
+    assert sum(entry.stat().st_size for entry in entries) <= cache.disk_bytes
+
+    # The most recent thumbnail is still on disk for a new cache
+    del generated[:]
+    ThumbnailCache(cache_dir, disk_bytes=cache.disk_bytes).get(paths[-1])
+    assert generated == []
+
+def test_changed_files_are_generated_again(tmp_path, generated):
+    path, = write_images(tmp_path, 1)
+    cache = ThumbnailCache()
+    cache.get(path)
+    cache.get(path)
+    assert len(generated) == 1
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cache.get(path)
+    assert len(generated) == 2
+
+    # A rewrite of a different size with the modification time put back
+    stat = os.stat(path)
+    synthetic.make_image((50, 30), 'RGB', 1).save(path)
+    assert os.stat(path).st_size != stat.st_size
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    cache.get(path)
+    assert len(generated) == 3
+
+def test_unreadable_files_are_cached_as_none(tmp_path, generated):
+    path = tmp_path / 'broken.heic'
+    path.write_bytes(b'not an image')
+    cache = ThumbnailCache(str(tmp_path / 'cache'))
+    assert cache.get(str(path)) is None
+    assert cache.get(str(path)) is None
+    assert generated == [str(path)]
+    assert cache.get(str(tmp_path / 'missing.heic')) is None
+
+class BlockingCache:
+    """Stands in for ThumbnailCache; holds the first request until released."""
+
+    def __init__(self):
+        self.requested = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def get(self, path):
+        self.requested.append(path)
+        self.started.set()
+        self.release.wait(10)
+        return None
+
+def test_request_drops_paths_superseded_before_they_start(qapp):
+    cache = BlockingCache()
+    loader = ThumbnailLoader(cache, threads=1)
+    loader.request(['a', 'b', 'c'])
+    assert cache.started.wait(10)
+    # Scrolled on while 'a' was generated: 'b' and 'c' are no longer wanted
+    loader.request(['a', 'd'])
+    cache.release.set()
+    loader._pool.waitForDone()
+    assert cache.requested == ['a', 'd']
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Thumbnails
+Preview thumbnails for the GUI file list, generated off the UI thread.
+
+Most HEIC files from phones and cameras carry a small embedded thumbnail,
+which is read instead of decoding the full image. HEIC and AVIF files
+without one get a file-type placeholder rather than a full decode, which
+for a large photo costs as much as converting it; other files are decoded
+and scaled down (JPEGs at reduced resolution through Pillow's draft mode).
+Thumbnails are cached in memory and on disk, both with least-recently-used
+eviction, keyed by path, modification time and size so edited files are
+picked up again. Only the rows the list actually shows are requested, and
+requests for rows scrolled out of view before their turn are dropped.
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Iterable, Optional, Set
+
+import pillow_heif
+from PIL import Image, ImageDraw, ImageOps
+from PyQt6.QtCore import QObject, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage
+
+try:
+    from . import core, formats
+except ImportError:
+    import core
+    import formats
+
+# Longest side of a generated thumbnail in pixels
+THUMBNAIL_SIZE = 96
+DEFAULT_MEMORY_ITEMS = 1024
+DEFAULT_DISK_BYTES = 64 * 1024 * 1024
+DEFAULT_THUMBNAIL_THREADS = 2
+# Background and label colour of the placeholder for files without an embedded thumbnail
+PLACEHOLDER_COLORS = ((225, 225, 225), (110, 110, 110))
+
+def default_cache_dir() -> str:
+    return os.path.join(core.cache_dir(), 'thumbnails')
+
+def placeholder(label: str, size: int = THUMBNAIL_SIZE) -> Image.Image:
+    """Square RGB placeholder showing a file type label, e.g. 'HEIC'."""
+    background, foreground = PLACEHOLDER_COLORS
+    img = Image.new('RGB', (size, size), background)
+    draw = ImageDraw.Draw(img)
+    left, top, right, bottom = draw.textbbox((0, 0), label)
+    draw.text(((size - (right - left)) / 2 - left, (size - (bottom - top)) / 2 - top), label, fill=foreground)
+    return img
+
+def make_thumbnail(path: str, size: int = THUMBNAIL_SIZE) -> Image.Image:
+    """
+    Build an RGB thumbnail no larger than size x size.
+
+    HEIC and AVIF files use their embedded thumbnail, or a placeholder if
+    they have none, so no full image is decoded; transparent images are
+    flattened onto white.
+
+    Raises:
+        OSError: If the file cannot be read or decoded
+    """
+    img = None
+    fmt = formats.detect_format(path)
+    if fmt is not None and fmt.name in ('heic', 'avif'):
+        try:
+            heif_file = pillow_heif.open_heif(path, convert_hdr_to_8bit=True)
+            primary = heif_file[heif_file.primary_index]
+            if not primary.info.get('thumbnails'):
+                return placeholder(fmt.name.upper(), size)
+            img = primary.get_thumbnail(0).to_pillow()
+        except (ValueError, RuntimeError) as e:
+            raise OSError(f"Cannot read {path}: {e}") from e
+    if img is None:
+        with Image.open(path) as source:
+            # Lets JPEG decode straight to a reduced size; a no-op for other formats
+            source.draft('RGB', (size, size))
+            img = ImageOps.exif_transpose(source)
+            img.load()
+    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+    if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+class ThumbnailCache:
+    """
+    Thread-safe two-level LRU cache of JPEG-encoded thumbnails.
+
+    Args:
+        cache_dir: Directory for the disk cache, or None to keep thumbnails in memory only
+        size: Longest side of the thumbnails in pixels
+        memory_items: Most thumbnails kept in memory
+        disk_bytes: Most bytes the disk cache may use
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, size: int = THUMBNAIL_SIZE,
+                 memory_items: int = DEFAULT_MEMORY_ITEMS, disk_bytes: int = DEFAULT_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.memory_items = max(1, memory_items)
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        # Files that could not be read are remembered as None so they are not retried on every scroll
+        self._memory: 'OrderedDict[str, Optional[bytes]]' = OrderedDict()
+        self._disk_used: Optional[int] = None
+
+    def _key(self, path: str) -> str:
+        stat = os.stat(path)
+        identity = f"{os.path.realpath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0{self.size}"
+        return hashlib.sha1(identity.encode('utf-8', 'surrogateescape')).hexdigest()
+
+    def get(self, path: str) -> Optional[bytes]:
+        """
+        JPEG bytes of a file's thumbnail, generating it on a cache miss.
+
+        Returns:
+            The encoded thumbnail, or None if the file cannot be read
+        """
+        try:
+            key = self._key(path)
+        except OSError:
+            return None
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        data = self._load_disk(key)
+        if data is None:
+            try:
+                img = make_thumbnail(path, self.size)
+                buffer = io.BytesIO()
+                img.save(buffer, 'JPEG', quality=85)
+                data = buffer.getvalue()
+            except (OSError, ValueError, Image.DecompressionBombError):
+                data = None
+            else:
+                self._store_disk(key, data)
+
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+        return data
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.jpg')
+
+    def _load_disk(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # The modification time doubles as the last use for eviction; access times are often not kept
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _store_disk(self, key: str, data: bytes):
+        if not self.cache_dir or len(data) > self.disk_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written under a temporary name so a concurrent reader never sees a partial file
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_used += len(data)
+            if self._disk_used > self.disk_bytes:
+                self._evict_disk()
+
+    def _disk_entries(self):
+        """(mtime, size, path) of every cached thumbnail file."""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.jpg'):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _evict_disk(self):
+        """Remove the least recently used files until the disk cache is below 90% of its limit."""
+        entries = sorted(self._disk_entries())
+        used = sum(size for _, size, _ in entries)
+        target = self.disk_bytes * 0.9
+        for _, size, path in entries:
+            if used <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            used -= size
+        self._disk_used = used
+
+class ThumbnailLoader(QObject):
+    """
+    Generates thumbnails on a background thread pool for the GUI.
+
+    request() replaces the set of wanted files, so rows that scrolled out of
+    view before their turn are never generated. Results arrive through the
+    ready signal on the UI thread.
+
+    Args:
+        cache: ThumbnailCache to read thumbnails from
+        threads: Number of background threads
+    """
+    ready = pyqtSignal(str, QImage)  # file_path, thumbnail
+
+    def __init__(self, cache: Optional[ThumbnailCache] = None, threads: int = DEFAULT_THUMBNAIL_THREADS,
+                 parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.cache = cache if cache is not None else ThumbnailCache(default_cache_dir())
+        self.threads = max(1, threads)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(self.threads)
+        self._lock = threading.Lock()
+        self._wanted: Deque[str] = deque()
+        self._in_flight: Set[str] = set()
+        self._running = 0
+
+    def request(self, paths: Iterable[str]):
+        """Generate thumbnails for these files, in order, dropping earlier requests not yet started."""
+        with self._lock:
+            self._wanted = deque(path for path in paths if path not in self._in_flight)
+            start = min(self.threads - self._running, len(self._wanted))
+            self._running += start
+        for _ in range(start):
+            self._pool.start(self._work)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._running -= 1
+                    return
+                path = self._wanted.popleft()
+                self._in_flight.add(path)
+            try:
+                data = self.cache.get(path)
+            finally:
+                with self._lock:
+                    self._in_flight.discard(path)
+            if data is not None:
+                image = QImage.fromData(data)
+                if not image.isNull():
+                    self.ready.emit(path, image)
+
+    def shutdown(self):
+        """Drop pending requests and wait for thumbnails in progress."""
+        self.request([])
+        self._pool.waitForDone()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Local Tools: HEIC Converter - Output Writer
+Writes encoded images on a separate thread pool so slow storage does not
+stall encoding.
+
+Conversion workers encode into memory and hand the bytes to the writer
+through a queue bounded by file count and by bytes, so a slow disk or
+network mount applies back-pressure instead of letting memory grow. A
+result is only reported once its file has reached the requested durability:
+
+    none   written and closed; the OS flushes it when it sees fit
+    file   the file and its directory entry are fsynced before reporting
+    batch  files are fsynced in groups, and each directory once per group,
+           which amortizes the slow directory syncs on network storage
+
+Author: Denis Dukhvalov
+Created with: Windsurf Editor
+License: MIT
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, List, Optional, Set, Tuple
+
+try:
+    from .core import copy_file
+except ImportError:
+    from core import copy_file
+
+DURABILITY_MODES = ('none', 'file', 'batch')
+DEFAULT_WRITER_THREADS = 4
+DEFAULT_FSYNC_BATCH = 64
+# Most encoded bytes allowed to wait in the queue before submit() blocks
+DEFAULT_MAX_PENDING_BYTES = 256 * 1024 * 1024
+
+class _WriteJob:
+    """Bytes to write, or a file to copy, for one conversion result."""
+
+    def __init__(self, result, data: Optional[bytes], copy_from: Optional[str]):
+        self.result = result
+        self.data = data
+        self.copy_from = copy_from
+        self.future: Future = Future()
+
+    @property
+    def size(self) -> int:
+        return len(self.data) if self.data is not None else 0
+
+def _fsync_directory(path: str):
+    """Persist a directory entry; not possible on Windows, where it is skipped."""
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class OutputWriter:
+    """
+    Thread pool writing conversion outputs with selectable durability.
+
+    Args:
+        threads: Number of writer threads
+        durability: 'none', 'file' or 'batch' (see the module docstring)
+        fsync_batch: Files per fsync group in 'batch' mode
+        max_pending: Most files waiting to be written before submit() blocks
+        max_pending_bytes: Most bytes waiting to be written before submit() blocks
+    """
+
+    def __init__(self, threads: int = DEFAULT_WRITER_THREADS, durability: str = 'none',
+                 fsync_batch: int = DEFAULT_FSYNC_BATCH, max_pending: Optional[int] = None,
+                 max_pending_bytes: int = DEFAULT_MAX_PENDING_BYTES):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode {durability!r}, expected one of {', '.join(DURABILITY_MODES)}")
+        self.threads = max(1, threads)
+        self.durability = durability
+        self.fsync_batch = max(1, fsync_batch)
+        self.max_pending = max_pending or 4 * self.threads
+        self.max_pending_bytes = max_pending_bytes
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._queue: Deque[_WriteJob] = deque()
+        self._queued_bytes = 0
+        self._active = 0
+        # Written but not yet fsynced files in 'batch' mode: (job, open file descriptor)
+        self._unsynced: List[Tuple[_WriteJob, int]] = []
+        self._closed = False
+        # Seconds submit() spent blocked on a full queue, a sign that storage is the bottleneck
+        self.blocked_seconds = 0.0
+        self._workers: List[threading.Thread] = []
+        self._running: Set[int] = set()
+        self.set_threads(self.threads)
+
+    def set_threads(self, count: int) -> int:
+        """
+        Change the number of writer threads; surplus threads exit once idle.
+
+        Returns:
+            The new number of threads
+        """
+        with self._changed:
+            self.threads = max(1, count)
+            for index in range(self.threads):
+                if index not in self._running:
+                    self._running.add(index)
+                    worker = threading.Thread(target=self._run, args=(index,), name=f"output-writer-{index}",
+                                              daemon=True)
+                    self._workers.append(worker)
+                    worker.start()
+            self._changed.notify_all()
+            return self.threads
+
+    def submit(self, result, data: bytes) -> Future:
+        """
+        Queue encoded bytes for result.output_path, blocking while the queue is full.
+
+        Returns:
+            Future resolving to the result once the file is written, with
+            success, bytes_out and the 'write' stage time filled in
+        """
+        return self._submit(_WriteJob(result, data, None))
+
+    def submit_copy(self, result, source: str) -> Future:
+        """Queue a copy of source to result.output_path; see submit()."""
+        return self._submit(_WriteJob(result, None, source))
+
+    def _submit(self, job: _WriteJob) -> Future:
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("Output writer is closed")
+            # An empty queue always admits a job, however large, so a single big file cannot deadlock
+            start = time.perf_counter()
+            while self._queue and (len(self._queue) >= self.max_pending or
+                                   self._queued_bytes + job.size > self.max_pending_bytes):
+                self._changed.wait()
+            self.blocked_seconds += time.perf_counter() - start
+            self._queue.append(job)
+            self._queued_bytes += job.size
+            self._changed.notify_all()
+        return job.future
+
+    def flush(self):
+        """Block until every queued file is written and, in 'batch' mode, fsynced."""
+        with self._changed:
+            while self._queue or self._active:
+                self._changed.wait()
+            batch, self._unsynced = self._unsynced, []
+        self._sync_batch(batch)
+
+    def close(self):
+        """Flush and stop the writer threads."""
+        self.flush()
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self) -> 'OutputWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self, index: int):
+        while True:
+            with self._changed:
+                while not self._queue and not self._closed and index < self.threads:
+                    self._changed.wait()
+                if not self._queue or index >= self.threads:
+                    self._running.discard(index)
+                    return
+                job = self._queue.popleft()
+                self._queued_bytes -= job.size
+                self._active += 1
+                self._changed.notify_all()
+
+            batch: List[Tuple[_WriteJob, int]] = []
+            try:
+                fd = self._write(job)
+                if fd is not None:
+                    with self._lock:
+                        self._unsynced.append((job, fd))
+                        if len(self._unsynced) >= self.fsync_batch:
+                            batch, self._unsynced = self._unsynced, []
+                # Still counted as active, so flush() waits for this group too
+                self._sync_batch(batch)
+            finally:
+                with self._changed:
+                    self._active -= 1
+                    self._changed.notify_all()
+
+    def _write(self, job: _WriteJob) -> Optional[int]:
+        """
+        Write one job and resolve its future, unless its fsync is deferred.
+
+        Returns:
+            The still open file descriptor when the fsync is left to a batch
+        """
+        result = job.result
+        path = result.output_path
+        start = time.perf_counter()
+        fd = None
+        try:
+            if job.copy_from is not None:
+                result.passthrough = copy_file(job.copy_from, path)
+                if self.durability != 'none':
+                    fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            else:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+                result.bytes_out = len(job.data)
+                view = memoryview(job.data)
+                while view:
+                    view = view[os.write(fd, view):]
+                job.data = None
+            if fd is not None and self.durability == 'file':
+                os.fsync(fd)
+                _fsync_directory(os.path.dirname(os.path.abspath(path)))
+            result.success = True
+        except Exception as e:
+            result.fail(f"Error writing {path}: {str(e)}", type(e).__name__)
+        finally:
+            result.stage_times['write'] = result.stage_times.get('write', 0.0) + time.perf_counter() - start
+
+        if fd is not None and result.success and self.durability == 'batch':
+            return fd
+        if fd is not None:
+            os.close(fd)
+        job.future.set_result(result)
+        return None
+
+    def _sync_batch(self, batch: List[Tuple[_WriteJob, int]]):
+        """Fsync a group of written files, then each of their directories once."""
+        if not batch:
+            return
+        start = time.perf_counter()
+        error: Optional[Exception] = None
+        try:
+            for _, fd in batch:
+                os.fsync(fd)
+            for directory in {os.path.dirname(os.path.abspath(job.result.output_path)) for job, _ in batch}:
+                _fsync_directory(directory)
+        except Exception as e:
+            error = e
+        finally:
+            for _, fd in batch:
+                os.close(fd)
+        # The group's sync time is shared out evenly over its files
+        share = (time.perf_counter() - start) / len(batch)
+        for job, _ in batch:
+            result = job.result
+            result.stage_times['write'] = result.stage_times.get('write', 0.0) + share
+            if error is not None:
+                result.fail(f"Error syncing {result.output_path}: {str(error)}", type(error).__name__)
+            job.future.set_result(result)